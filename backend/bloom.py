@@ -0,0 +1,78 @@
+"""
+Bloom Filter
+In-memory set membership test with no false negatives.
+"""
+
+import hashlib
+import struct
+from typing import Iterable, Union
+
+
+# Bits per expected element. With 4 probes this keeps the false positive
+# rate around 0.05% at full capacity.
+_BITS_PER_ITEM = 24
+
+_WORDS = struct.Struct("<4Q")
+
+
+def _probes(key: Union[bytes, str]):
+    """Four 64-bit probe values for a key."""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    if len(key) != 32:
+        # Only SHA-256 digests are uniform enough to use as-is
+        key = hashlib.blake2b(key, digest_size=32).digest()
+    return _WORDS.unpack(key)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for hash keys.
+
+    Keys are usually SHA-256 digests, whose bytes are already uniformly
+    distributed, so the probe positions are taken straight from the digest
+    instead of hashing it again. Items can't be removed; rebuild the filter
+    instead.
+    """
+
+    def __init__(self, capacity: int):
+        size = 1 << max(capacity * _BITS_PER_ITEM - 1, 1).bit_length()
+        self.capacity = capacity
+        self._mask = size - 1
+        self._bits = bytearray(size >> 3 or 1)
+        self._count = 0
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[Union[bytes, str]], capacity: int) -> "BloomFilter":
+        """Build a filter holding all keys."""
+        bloom = cls(capacity)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def add(self, key: Union[bytes, str]):
+        """Add a key."""
+        bits = self._bits
+        mask = self._mask
+        for probe in _probes(key):
+            i = probe & mask
+            bits[i >> 3] |= 1 << (i & 7)
+        self._count += 1
+
+    def __contains__(self, key: Union[bytes, str]) -> bool:
+        bits = self._bits
+        mask = self._mask
+        for probe in _probes(key):
+            i = probe & mask
+            if not bits[i >> 3] & (1 << (i & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        """Number of keys added (duplicates included)."""
+        return self._count
+
+    @property
+    def is_full(self) -> bool:
+        """True once more keys were added than the filter was sized for."""
+        return self._count > self.capacity
@@ -14,10 +14,19 @@ DATA_DIR.mkdir(exist_ok=True)
 # Database
 DATABASE_PATH = DATA_DIR / "malguard.db"
 
+# In-process signature lookup cache (per worker). Entries expire so that
+# changes made through another worker are picked up within the TTL.
+SIGNATURE_CACHE_SIZE = 100_000
+SIGNATURE_CACHE_TTL = 300          # seconds, known signatures
+SIGNATURE_CACHE_MISS_TTL = 30      # seconds, "not found" results
+
 # File uploads
 UPLOAD_DIR = DATA_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100 MB
+# Archive members larger than this (uncompressed) are not extracted,
+# which keeps zip bombs from being inflated into memory
+MAX_SCAN_SIZE = MAX_UPLOAD_SIZE
 
 # YARA rules
 YARA_RULES_DIR = DATA_DIR / "yara_rules"
@@ -27,7 +36,7 @@ YARA_RULES_DIR.mkdir(exist_ok=True)
 CORS_ORIGINS = ["*"]
 
 # Suspicious file extensions
-SUSPICIOUS_EXTENSIONS = {
+SUSPICIOUS_EXTENSIONS = frozenset({
     '.exe', '.dll', '.sys', '.scr', '.pif', '.com',
     '.bat', '.cmd', '.ps1', '.vbs', '.vbe', '.js', '.jse', '.wsf', '.wsh',
     '.jar', '.py', '.pyw', '.sh', '.bash',
@@ -35,4 +44,4 @@ SUSPICIOUS_EXTENSIONS = {
     '.elf', '.bin', '.run', '.deb', '.rpm', '.dmg', '.app', '.pkg',
     '.apk', '.ipa',
     '.docm', '.xlsm', '.pptm',
-}
+})
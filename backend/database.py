@@ -4,12 +4,83 @@ SQLite-based signature storage and scan history.
 """
 
 import aiosqlite
+import asyncio
 import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union, AsyncIterator
 
-from config import DATABASE_PATH
+from bloom import BloomFilter
+from config import (
+    DATABASE_PATH, SIGNATURE_CACHE_SIZE, SIGNATURE_CACHE_TTL, SIGNATURE_CACHE_MISS_TTL
+)
+
+
+# Signature and scan hashes are stored as raw 32-byte BLOBs and converted
+# back to lowercase hex in SQL, so rows come out ready for the API. Hashes
+# that aren't valid hex are kept as TEXT and pass through unchanged.
+def _hex_sql(column: str) -> str:
+    """SQL expression rendering a stored hash column as hex."""
+    return f"CASE typeof({column}) WHEN 'blob' THEN lower(hex({column})) ELSE {column} END"
+
+
+_HASH_HEX = _hex_sql("hash")
+# Timestamps are written by CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS") and
+# returned in ISO 8601 form, as the API has always serialized them.
+_SIGNATURE_COLUMNS = (
+    f"{_HASH_HEX} AS hash, name, severity, source, "
+    "replace(added_on, ' ', 'T') AS added_on"
+)
+_HISTORY_COLUMNS = (
+    f"id, file_name, file_size, extension, {_HASH_HEX} AS hash, "
+    "detected, malware_name, severity, reason, replace(timestamp, ' ', 'T') AS timestamp"
+)
+
+# Hot-path statements. sqlite3 caches prepared statements per connection,
+# keyed by SQL text, so these are compiled once and reused on every call.
+_ADD_SIGNATURE_SQL = "INSERT INTO signatures (hash, name, severity, source) VALUES (?, ?, ?, ?)"
+_GET_SIGNATURE_SQL = f"SELECT {_SIGNATURE_COLUMNS} FROM signatures WHERE hash = ?"
+_LOG_SCAN_SQL = """INSERT INTO scan_history
+    (file_name, file_size, extension, hash, detected, malware_name, severity, reason)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# Keys per IN (...) query in get_signatures_bulk, well under SQLite's
+# bound-parameter limit
+_BULK_LOOKUP_SIZE = 500
+
+# Buffered scan log rows are written once this many have accumulated
+_LOG_BATCH_SIZE = 500
+
+# Scan log rows of the current batched_scan_logs() block. A context
+# variable keeps concurrent requests apart, while tasks spawned inside
+# the block (asyncio.gather) share the same buffer.
+_scan_log_buffer: ContextVar[Optional[List[tuple]]] = ContextVar("scan_log_buffer", default=None)
+
+# Smallest signature filter built, so a near-empty database still leaves
+# room for signatures added at runtime before the filter is rebuilt
+_FILTER_MIN_CAPACITY = 1024
+
+# Stored in PRAGMA user_version once the schema below is in place.
+# Bump it (and branch in _create_tables) for future migrations.
+SCHEMA_VERSION = 1
+
+
+def _hash_key(hash: Union[str, bytes]):
+    """
+    Storage key for a hash: raw bytes for hex digests, lowercase text otherwise.
+    
+    Raw digests (bytes) are already in storage form and pass through.
+    """
+    if isinstance(hash, bytes):
+        return hash
+    try:
+        return bytes.fromhex(hash)
+    except ValueError:
+        return hash.lower()
 
 
 class Database:
@@ -18,23 +89,71 @@ class Database:
     def __init__(self, db_path: Path = DATABASE_PATH):
         self.db_path = db_path
         self._connection: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._transaction_owner: Optional[asyncio.Task] = None
+        self._fts_available = False
+        # hash key -> (expires_at, signature or None), least recently used first
+        self._signature_cache: OrderedDict = OrderedDict()
+        # Bumped on every signature write so in-flight lookups don't cache stale rows
+        self._cache_generation = 0
+        # Bloom filter of all signature hashes; a miss means "not a signature"
+        # without a query. None until loaded (lookups then go to the database).
+        self._signature_filter: Optional[BloomFilter] = None
+        self._filter_data_version: Optional[int] = None
+        self._filter_checked_at = 0.0
+        self._filter_stale = False
+        # Keys added while the filter is being rebuilt
+        self._filter_backlog: Optional[List[Any]] = None
     
     async def connect(self):
         """Connect to database and create tables."""
-        self._connection = await aiosqlite.connect(self.db_path)
+        # Autocommit mode: single statements commit on their own and
+        # grouped writes use explicit transactions via transaction().
+        self._connection = await aiosqlite.connect(self.db_path, isolation_level=None)
         self._connection.row_factory = aiosqlite.Row
+        await self._configure()
         await self._create_tables()
+        await self._warm_up()
+        await self._load_signature_filter()
     
     async def disconnect(self):
         """Close database connection."""
         if self._connection:
             await self._connection.close()
     
+    async def _configure(self):
+        """Tune connection PRAGMAs (WAL journal, larger page cache)."""
+        await self._connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -64000;
+            PRAGMA mmap_size = 268435456;
+            PRAGMA foreign_keys = ON;
+        """)
+
+    async def _warm_up(self):
+        """
+        Run the signature lookup once so its statement is compiled and cached
+        and the primary key's root pages are read before the first scan.
+        """
+        cursor = await self._connection.execute(_GET_SIGNATURE_SQL, (b"",))
+        await cursor.fetchone()
+
     async def _create_tables(self):
-        """Create database tables if they don't exist."""
+        """Create database tables, unless this database is already up to date."""
+        cursor = await self._connection.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+        if version >= SCHEMA_VERSION:
+            cursor = await self._connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'signatures_fts'"
+            )
+            self._fts_available = await cursor.fetchone() is not None
+            return
+        
         await self._connection.executescript("""
             CREATE TABLE IF NOT EXISTS signatures (
-                hash TEXT PRIMARY KEY,
+                hash BLOB PRIMARY KEY,
                 name TEXT NOT NULL,
                 severity TEXT DEFAULT 'medium',
                 source TEXT DEFAULT 'user',
@@ -46,7 +165,7 @@ class Database:
                 file_name TEXT NOT NULL,
                 file_size INTEGER,
                 extension TEXT,
-                hash TEXT,
+                hash BLOB,
                 detected INTEGER DEFAULT 0,
                 malware_name TEXT,
                 severity TEXT,
@@ -54,55 +173,367 @@ class Database:
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
             
-            CREATE INDEX IF NOT EXISTS idx_scan_detected ON scan_history(detected);
+            CREATE TABLE IF NOT EXISTS quarantine (
+                hash TEXT PRIMARY KEY,
+                original_name TEXT,
+                malware_name TEXT,
+                severity TEXT,
+                original_path TEXT,
+                quarantined_on TIMESTAMP
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_scan_det_ts ON scan_history(detected, timestamp DESC);
             CREATE INDEX IF NOT EXISTS idx_scan_timestamp ON scan_history(timestamp);
+            -- Covered by the leading column of idx_scan_det_ts
+            DROP INDEX IF EXISTS idx_scan_detected;
         """)
         await self._connection.commit()
+        await self._migrate_hex_hashes()
+        await self._create_search_index()
+        await self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    async def _migrate_hex_hashes(self):
+        """Convert hex TEXT hashes left by older databases to BLOBs."""
+        converted = {}
+        for table in ("signatures", "scan_history"):
+            cursor = await self._connection.execute(
+                f"SELECT rowid, hash FROM {table} WHERE typeof(hash) = 'text'"
+            )
+            converted[table] = [
+                (key, rowid)
+                for rowid, value in await cursor.fetchall()
+                if isinstance(key := _hash_key(value), bytes)
+            ]
+        
+        if not any(converted.values()):
+            return
+        
+        async with self.transaction():
+            if converted["signatures"]:
+                # Drop the old search index instead of updating it row by row;
+                # _create_search_index rebuilds it from the converted hashes
+                for statement in (
+                    "DROP TRIGGER IF EXISTS signatures_fts_insert",
+                    "DROP TRIGGER IF EXISTS signatures_fts_delete",
+                    "DROP TRIGGER IF EXISTS signatures_fts_update",
+                    "DROP TABLE IF EXISTS signatures_fts",
+                ):
+                    await self._connection.execute(statement)
+            for table, updates in converted.items():
+                await self._connection.executemany(
+                    f"UPDATE OR IGNORE {table} SET hash = ? WHERE rowid = ?",
+                    updates
+                )
+    
+    async def _create_search_index(self):
+        """Create the trigram FTS5 index used by search_signatures, if supported."""
+        cursor = await self._connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'signatures_fts'"
+        )
+        exists = await cursor.fetchone() is not None
+        
+        try:
+            await self._connection.executescript(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS signatures_fts USING fts5(
+                    name, hash,
+                    content='signatures', content_rowid='rowid',
+                    tokenize='trigram'
+                );
+                
+                CREATE TRIGGER IF NOT EXISTS signatures_fts_insert AFTER INSERT ON signatures BEGIN
+                    INSERT INTO signatures_fts(rowid, name, hash)
+                    VALUES (new.rowid, new.name, {_hex_sql('new.hash')});
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS signatures_fts_delete AFTER DELETE ON signatures BEGIN
+                    INSERT INTO signatures_fts(signatures_fts, rowid, name, hash)
+                    VALUES ('delete', old.rowid, old.name, {_hex_sql('old.hash')});
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS signatures_fts_update AFTER UPDATE ON signatures BEGIN
+                    INSERT INTO signatures_fts(signatures_fts, rowid, name, hash)
+                    VALUES ('delete', old.rowid, old.name, {_hex_sql('old.hash')});
+                    INSERT INTO signatures_fts(rowid, name, hash)
+                    VALUES (new.rowid, new.name, {_hex_sql('new.hash')});
+                END;
+            """)
+        except aiosqlite.OperationalError:
+            # SQLite built without FTS5/trigram - search falls back to LIKE
+            self._fts_available = False
+            return
+        
+        self._fts_available = True
+        if not exists:
+            # Index signatures added before the FTS table existed. 'rebuild'
+            # would read the raw BLOB hashes, so insert the hex form instead.
+            await self._connection.execute(
+                f"""INSERT INTO signatures_fts(rowid, name, hash)
+                    SELECT rowid, name, {_HASH_HEX} FROM signatures"""
+            )
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Group several writes into one BEGIN IMMEDIATE ... COMMIT.
+
+        Re-entrant within the same task, so methods that open their own
+        transaction can be called inside an outer one.
+        """
+        if self._transaction_owner is asyncio.current_task():
+            yield
+            return
+        
+        async with self._write_lock:
+            self._transaction_owner = asyncio.current_task()
+            try:
+                await self._connection.execute("BEGIN IMMEDIATE")
+                try:
+                    yield
+                except BaseException:
+                    await self._connection.rollback()
+                    raise
+                await self._connection.commit()
+            finally:
+                self._transaction_owner = None
+    
+    async def _write(self, query: str, params: tuple = ()) -> aiosqlite.Cursor:
+        """Execute a single write statement (autocommits outside transaction())."""
+        if self._transaction_owner is asyncio.current_task():
+            return await self._connection.execute(query, params)
+        async with self._write_lock:
+            return await self._connection.execute(query, params)
+    
+    async def _fetch_dicts(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """Run a query and build result dicts directly from plain row tuples."""
+        cursor = await self._connection.execute(query, params)
+        cursor.row_factory = None  # Skip the intermediate aiosqlite.Row objects
+        rows = await cursor.fetchall()
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
     
     # ============== Signature Methods ==============
     
+    def _invalidate_signatures(self, keys=None):
+        """Drop cached lookups for the given hash keys, or all of them."""
+        self._cache_generation += 1
+        if keys is None:
+            self._signature_cache.clear()
+        else:
+            for key in keys:
+                self._signature_cache.pop(key, None)
+    
+    async def _load_signature_filter(self):
+        """(Re)build the signature Bloom filter from the signatures table."""
+        self._filter_backlog = []
+        try:
+            cursor = await self._connection.execute("PRAGMA data_version")
+            data_version = (await cursor.fetchone())[0]
+            cursor = await self._connection.execute("SELECT hash FROM signatures")
+            cursor.row_factory = None
+            keys = [row[0] for row in await cursor.fetchall()]
+            # Filling the filter is pure Python work; keep it off the event loop
+            bloom = await asyncio.to_thread(
+                BloomFilter.from_keys, keys, max(2 * len(keys), _FILTER_MIN_CAPACITY)
+            )
+            for key in self._filter_backlog:
+                bloom.add(key)
+        finally:
+            self._filter_backlog = None
+        
+        self._signature_filter = bloom
+        self._filter_data_version = data_version
+        self._filter_stale = False
+    
+    async def _current_signature_filter(self, now: float) -> Optional[BloomFilter]:
+        """
+        The signature Bloom filter, rebuilt first if it is out of date.
+        
+        A key missing from the filter is certainly not a signature; keys
+        found in it still have to be looked up. Writes through this
+        connection update the filter directly. Commits by other connections
+        (other workers) change PRAGMA data_version, which is checked at most
+        every SIGNATURE_CACHE_MISS_TTL seconds, the same delay already
+        accepted for cached misses.
+        """
+        if now >= self._filter_checked_at + SIGNATURE_CACHE_MISS_TTL:
+            self._filter_checked_at = now
+            cursor = await self._connection.execute("PRAGMA data_version")
+            if (await cursor.fetchone())[0] != self._filter_data_version:
+                self._filter_stale = True
+        if self._filter_stale and self._filter_backlog is None:
+            await self._load_signature_filter()
+        return self._signature_filter
+    
+    def _remember_signatures(self, keys: List[Any]):
+        """Add newly written signature keys to the Bloom filter."""
+        bloom = self._signature_filter
+        if bloom is not None:
+            for key in keys:
+                bloom.add(key)
+            if bloom.is_full:
+                self._filter_stale = True
+        if self._filter_backlog is not None:
+            self._filter_backlog.extend(keys)
+    
+    def _cached_signature(self, key, now: float):
+        """Return (hit, signature) for a cache key."""
+        cached = self._signature_cache.get(key)
+        if cached is not None and cached[0] > now:
+            self._signature_cache.move_to_end(key)
+            return True, cached[1]
+        return False, None
+    
+    def _cache_signature(self, key, signature: Optional[Dict[str, Any]], now: float):
+        """Store a lookup result, evicting the least recently used entry if full."""
+        ttl = SIGNATURE_CACHE_TTL if signature else SIGNATURE_CACHE_MISS_TTL
+        self._signature_cache[key] = (now + ttl, signature)
+        self._signature_cache.move_to_end(key)
+        if len(self._signature_cache) > SIGNATURE_CACHE_SIZE:
+            self._signature_cache.popitem(last=False)
+    
     async def add_signature(self, hash: str, name: str, 
                            severity: str = "medium", 
                            source: str = "user") -> bool:
         """Add a new signature to the database."""
         try:
-            await self._connection.execute(
-                "INSERT INTO signatures (hash, name, severity, source) VALUES (?, ?, ?, ?)",
-                (hash.lower(), name, severity, source)
+            key = _hash_key(hash)
+            # Before the write, so concurrent lookups can't skip the new row
+            self._remember_signatures([key])
+            await self._write(
+                _ADD_SIGNATURE_SQL,
+                (key, name, severity, source)
             )
-            await self._connection.commit()
+            self._invalidate_signatures([key])
             return True
         except aiosqlite.IntegrityError:
             return False  # Already exists
-    
+
+    async def add_signatures_bulk(self, rows: List[tuple]) -> int:
+        """
+        Add many signatures in a single transaction.
+
+        Args:
+            rows: (hash, name, severity, source) tuples
+
+        Returns:
+            Number of signatures added (duplicates are ignored)
+        """
+        if not rows:
+            return 0
+
+        params = [(_hash_key(hash), name, severity, source) for hash, name, severity, source in rows]
+        self._remember_signatures([row[0] for row in params])
+        async with self.transaction():
+            cursor = await self._connection.executemany(
+                "INSERT OR IGNORE INTO signatures (hash, name, severity, source) VALUES (?, ?, ?, ?)",
+                params
+            )
+        self._invalidate_signatures(row[0] for row in params)
+        return cursor.rowcount
+
     async def remove_signature(self, hash: str) -> bool:
         """Remove a signature from the database."""
-        cursor = await self._connection.execute(
+        key = _hash_key(hash)
+        cursor = await self._write(
             "DELETE FROM signatures WHERE hash = ?",
-            (hash.lower(),)
+            (key,)
         )
-        await self._connection.commit()
+        self._invalidate_signatures([key])
         return cursor.rowcount > 0
     
-    async def get_signature(self, hash: str) -> Optional[Dict[str, Any]]:
-        """Look up a signature by hash."""
+    async def get_signature(self, hash: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+        """Look up a signature by hex hash or raw digest (cached, including misses)."""
+        key = _hash_key(hash)
+        now = time.monotonic()
+        bloom = await self._current_signature_filter(now)
+        if bloom is not None and key not in bloom:
+            return None
+        hit, signature = self._cached_signature(key, now)
+        if hit:
+            return signature
+        
+        generation = self._cache_generation
         cursor = await self._connection.execute(
-            "SELECT * FROM signatures WHERE hash = ?",
-            (hash.lower(),)
+            _GET_SIGNATURE_SQL,
+            (key,)
         )
         row = await cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+        signature = dict(row) if row else None
+        
+        if generation == self._cache_generation:
+            self._cache_signature(key, signature, now)
+        return signature
+    
+    async def get_signatures_bulk(self, hashes: List[Union[str, bytes]]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Look up many hashes at once.
+        
+        Hashes ruled out by the Bloom filter and cached results are served
+        from memory, and the rest are fetched with batched IN (...) queries
+        instead of one query per hash.
+        
+        Returns:
+            Signatures keyed by the hashes (hex or raw digests) as given;
+            hashes with no signature are left out
+        """
+        now = time.monotonic()
+        bloom = await self._current_signature_filter(now)
+        found = {}
+        missing = {}  # storage key -> hashes as given
+        for hash in hashes:
+            key = _hash_key(hash)
+            if bloom is not None and key not in bloom:
+                continue
+            hit, signature = self._cached_signature(key, now)
+            if not hit:
+                missing.setdefault(key, []).append(hash)
+            elif signature:
+                found[hash] = signature
+        
+        if not missing:
+            return found
+        
+        generation = self._cache_generation
+        keys = list(missing)
+        rows = {}
+        for start in range(0, len(keys), _BULK_LOOKUP_SIZE):
+            chunk = keys[start:start + _BULK_LOOKUP_SIZE]
+            for row in await self._fetch_dicts(
+                f"SELECT {_SIGNATURE_COLUMNS} FROM signatures "
+                f"WHERE hash IN ({','.join('?' * len(chunk))})",
+                tuple(chunk)
+            ):
+                rows[_hash_key(row['hash'])] = row
+        
+        for key, given in missing.items():
+            signature = rows.get(key)
+            if generation == self._cache_generation:
+                self._cache_signature(key, signature, now)
+            if signature:
+                for hash in given:
+                    found[hash] = signature
+        return found
     
     async def list_signatures(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """List all signatures."""
-        cursor = await self._connection.execute(
-            "SELECT * FROM signatures ORDER BY added_on DESC LIMIT ? OFFSET ?",
+        return await self._fetch_dicts(
+            f"SELECT {_SIGNATURE_COLUMNS} FROM signatures ORDER BY added_on DESC LIMIT ? OFFSET ?",
             (limit, offset)
         )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    
+    async def iter_signatures(self, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every signature (newest first), fetching rows in batches."""
+        cursor = await self._connection.execute(
+            f"SELECT {_SIGNATURE_COLUMNS} FROM signatures ORDER BY added_on DESC"
+        )
+        cursor.row_factory = None
+        columns = [col[0] for col in cursor.description]
+        try:
+            while rows := await cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            await cursor.close()
     
     async def count_signatures(self) -> int:
         """Count total signatures."""
@@ -112,87 +543,213 @@ class Database:
     
     async def search_signatures(self, query: str) -> List[Dict[str, Any]]:
         """Search signatures by name or hash."""
-        cursor = await self._connection.execute(
-            "SELECT * FROM signatures WHERE name LIKE ? OR hash LIKE ? LIMIT 50",
+        # The trigram index needs at least 3 characters to match anything
+        if self._fts_available and len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return await self._fetch_dicts(
+                f"""SELECT {_SIGNATURE_COLUMNS} FROM signatures WHERE rowid IN (
+                       SELECT rowid FROM signatures_fts WHERE signatures_fts MATCH ? LIMIT 50
+                   )""",
+                (phrase,)
+            )
+        
+        return await self._fetch_dicts(
+            f"SELECT {_SIGNATURE_COLUMNS} FROM signatures WHERE name LIKE ? OR {_HASH_HEX} LIKE ? LIMIT 50",
             (f"%{query}%", f"%{query}%")
         )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
     
     async def filter_by_severity(self, severity: str) -> List[Dict[str, Any]]:
         """Filter signatures by severity level."""
-        cursor = await self._connection.execute(
-            "SELECT * FROM signatures WHERE severity = ? ORDER BY added_on DESC",
+        return await self._fetch_dicts(
+            f"SELECT {_SIGNATURE_COLUMNS} FROM signatures WHERE severity = ? ORDER BY added_on DESC",
             (severity,)
         )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
     
     async def clear_signatures(self) -> int:
         """Remove all signatures from the database."""
-        cursor = await self._connection.execute("DELETE FROM signatures")
-        await self._connection.commit()
+        cursor = await self._write("DELETE FROM signatures")
+        self._invalidate_signatures()
+        self._signature_filter = BloomFilter(_FILTER_MIN_CAPACITY)
         return cursor.rowcount
     
     # ============== Scan History Methods ==============
     
-    async def log_scan(self, result: Dict[str, Any]) -> int:
-        """Log a scan result."""
-        cursor = await self._connection.execute(
-            """INSERT INTO scan_history 
-               (file_name, file_size, extension, hash, detected, malware_name, severity, reason)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                result.get('file_name'),
-                result.get('file_size', 0),
-                result.get('extension'),
-                result.get('hash'),
-                1 if result.get('detected') else 0,
-                result.get('malware_name'),
-                result.get('severity'),
-                result.get('reason')
-            )
+    async def log_scan(self, result: Dict[str, Any], flush: bool = False) -> Optional[int]:
+        """
+        Log a scan result.
+
+        Inside batched_scan_logs() the row is buffered and None is returned;
+        otherwise it is written right away and its row id returned. With
+        flush, buffered rows are written along with it, so the row is part
+        of an enclosing transaction().
+        """
+        params = (
+            result.get('file_name'),
+            result.get('file_size', 0),
+            result.get('extension'),
+            _hash_key(result['hash']) if result.get('hash') else None,
+            1 if result.get('detected') else 0,
+            result.get('malware_name'),
+            result.get('severity'),
+            result.get('reason')
         )
-        await self._connection.commit()
-        return cursor.lastrowid
+        
+        buffer = _scan_log_buffer.get()
+        if buffer is None:
+            cursor = await self._write(_LOG_SCAN_SQL, params)
+            return cursor.lastrowid
+        
+        buffer.append(params)
+        if flush or len(buffer) >= _LOG_BATCH_SIZE:
+            await self._flush_scan_logs(buffer)
+        return None
+    
+    async def _flush_scan_logs(self, buffer: List[tuple]):
+        """Write buffered scan log rows with one executemany."""
+        if not buffer:
+            return
+        rows = buffer[:]
+        buffer.clear()
+        async with self.transaction():
+            await self._connection.executemany(_LOG_SCAN_SQL, rows)
+    
+    @asynccontextmanager
+    async def batched_scan_logs(self):
+        """
+        Buffer log_scan() calls and write them together when the block exits.
+
+        Used when scanning many files for one request (archives, batch
+        uploads) so history is written in a few statements instead of one
+        per file. Nested blocks share the outermost buffer.
+        """
+        if _scan_log_buffer.get() is not None:
+            yield
+            return
+        
+        buffer = []
+        token = _scan_log_buffer.set(buffer)
+        try:
+            yield
+        finally:
+            _scan_log_buffer.reset(token)
+            await self._flush_scan_logs(buffer)
     
     async def get_history(self, limit: int = 100, 
                          detections_only: bool = False) -> List[Dict[str, Any]]:
         """Get scan history."""
         if detections_only:
-            query = "SELECT * FROM scan_history WHERE detected = 1 ORDER BY timestamp DESC LIMIT ?"
+            query = f"SELECT {_HISTORY_COLUMNS} FROM scan_history WHERE detected = 1 ORDER BY timestamp DESC LIMIT ?"
         else:
-            query = "SELECT * FROM scan_history ORDER BY timestamp DESC LIMIT ?"
+            query = f"SELECT {_HISTORY_COLUMNS} FROM scan_history ORDER BY timestamp DESC LIMIT ?"
         
-        cursor = await self._connection.execute(query, (limit,))
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        return await self._fetch_dicts(query, (limit,))
     
     async def get_stats(self) -> Dict[str, int]:
         """Get scanning statistics."""
         cursor = await self._connection.execute("""
             SELECT 
                 COUNT(*) as total_scans,
-                SUM(CASE WHEN detected = 1 THEN 1 ELSE 0 END) as total_detections
+                SUM(detected) as total_detections,
+                (SELECT COUNT(*) FROM signatures) as total_signatures
             FROM scan_history
         """)
         row = await cursor.fetchone()
         
-        sig_cursor = await self._connection.execute("SELECT COUNT(*) FROM signatures")
-        sig_row = await sig_cursor.fetchone()
-        
         return {
             'total_scans': row['total_scans'] or 0,
             'total_detections': row['total_detections'] or 0,
-            'total_signatures': sig_row[0] or 0
+            'total_signatures': row['total_signatures'] or 0
         }
     
     async def clear_history(self) -> int:
         """Clear all scan history."""
-        cursor = await self._connection.execute("DELETE FROM scan_history")
-        await self._connection.commit()
+        cursor = await self._write("DELETE FROM scan_history")
+        return cursor.rowcount
+
+    # ============== Quarantine Methods ==============
+
+    async def add_quarantined(self, hash: str, original_name: str,
+                              malware_name: str, severity: str = "medium",
+                              original_path: Optional[str] = None) -> bool:
+        """Add a quarantine record. Returns False if the hash is already quarantined."""
+        cursor = await self._write(
+            """INSERT OR IGNORE INTO quarantine
+               (hash, original_name, malware_name, severity, original_path, quarantined_on)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (hash, original_name, malware_name, severity, original_path,
+             datetime.now().isoformat(timespec='seconds'))
+        )
+        return cursor.rowcount > 0
+
+    async def add_quarantined_bulk(self, rows: List[tuple]) -> int:
+        """
+        Add many quarantine records in a single transaction.
+
+        Args:
+            rows: (hash, original_name, malware_name, severity, original_path,
+                  quarantined_on) tuples
+
+        Returns:
+            Number of records added (existing hashes are ignored)
+        """
+        if not rows:
+            return 0
+
+        async with self.transaction():
+            cursor = await self._connection.executemany(
+                """INSERT OR IGNORE INTO quarantine
+                   (hash, original_name, malware_name, severity, original_path, quarantined_on)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+        return cursor.rowcount
+
+    async def list_quarantined(self) -> List[Dict[str, Any]]:
+        """List all quarantine records in insertion order."""
+        return await self._fetch_dicts("SELECT * FROM quarantine ORDER BY rowid")
+
+    async def find_quarantined(self, hash: str) -> List[Dict[str, Any]]:
+        """
+        Find quarantine records by exact hash, falling back to a prefix match.
+
+        Returns at most two records so callers can detect ambiguous prefixes.
+        """
+        cursor = await self._connection.execute(
+            "SELECT * FROM quarantine WHERE hash = ?",
+            (hash,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            return [dict(row)]
+
+        # A range on the primary key, so the prefix match uses its index
+        # (LIKE would treat '%' and '_' in the input as wildcards)
+        cursor = await self._connection.execute(
+            "SELECT * FROM quarantine WHERE hash >= ? AND hash < ? ORDER BY hash LIMIT 2",
+            (hash, hash + "\U0010ffff")
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    async def remove_quarantined(self, hash: str) -> bool:
+        """Remove a quarantine record by exact hash."""
+        cursor = await self._write(
+            "DELETE FROM quarantine WHERE hash = ?",
+            (hash,)
+        )
+        return cursor.rowcount > 0
+
+    async def clear_quarantine(self) -> int:
+        """Remove all quarantine records."""
+        cursor = await self._write("DELETE FROM quarantine")
         return cursor.rowcount
 
+    async def count_quarantined(self) -> int:
+        """Count quarantine records."""
+        cursor = await self._connection.execute("SELECT COUNT(*) FROM quarantine")
+        row = await cursor.fetchone()
+        return row[0]
+
 
 # Global database instance
 db = Database()
@@ -5,13 +5,35 @@ FastAPI server for web/mobile clients.
 Run with: uvicorn main:app --reload
 """
 
+import json
 from contextlib import asynccontextmanager
+from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import CORS_ORIGINS
 from database import db
+from scanner import scanner_service
 from routes import signatures_router, scan_router, history_router, quarantine_router
+from routes.quarantine import import_legacy_manifest, add_file_to_quarantine
+
+
+# YARA rules directory reported by /info; re-listed only when its mtime changes
+INFO_YARA_DIR = Path(__file__).parent.parent / "data" / "yara_rules"
+_yara_cache = {"mtime": None, "count": 0}
+
+
+def _yara_rule_count() -> int:
+    """Count YARA rule files, caching the result until the directory changes."""
+    try:
+        mtime = INFO_YARA_DIR.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+    
+    if mtime != _yara_cache["mtime"]:
+        _yara_cache["count"] = sum(1 for _ in INFO_YARA_DIR.glob("*.yar"))
+        _yara_cache["mtime"] = mtime
+    return _yara_cache["count"]
 
 
 @asynccontextmanager
@@ -20,6 +42,13 @@ async def lifespan(app: FastAPI):
     # Startup: Connect to database
     await db.connect()
     print("✅ Database connected")
+    scanner_service.register_quarantine_handler(add_file_to_quarantine)
+    registered = await scanner_service.register_hash_rules(db)
+    if registered:
+        print(f"🔑 Registered {registered} hash-only YARA rules as signatures")
+    imported = await import_legacy_manifest()
+    if imported:
+        print(f"📦 Imported {imported} quarantine records from manifest.json")
     yield
     # Shutdown: Disconnect from database
     await db.disconnect()
@@ -76,9 +105,6 @@ async def health():
 @app.post("/seed")
 async def seed_database():
     """Seed database with sample malware signatures."""
-    import json
-    from pathlib import Path
-    
     # Look for sample signatures file
     sample_file = Path(__file__).parent.parent / "data" / "sample_signatures.json"
     
@@ -89,21 +115,19 @@ async def seed_database():
         data = json.load(f)
     
     signatures = data.get('signatures', {})
-    added = 0
-    skipped = 0
-    
-    for hash_key, sig_data in signatures.items():
-        success = await db.add_signature(
-            hash=hash_key,
-            name=sig_data.get('name', 'Unknown'),
-            severity=sig_data.get('severity', 'medium'),
-            source=sig_data.get('source', 'seed')
+    rows = [
+        (
+            hash_key,
+            sig_data.get('name', 'Unknown'),
+            sig_data.get('severity', 'medium'),
+            sig_data.get('source', 'seed')
         )
-        if success:
-            added += 1
-        else:
-            skipped += 1
-    
+        for hash_key, sig_data in signatures.items()
+    ]
+
+    added = await db.add_signatures_bulk(rows)
+    skipped = len(rows) - added
+
     return {
         "success": True,
         "message": f"Database seeded: {added} added, {skipped} skipped (already exist)"
@@ -113,11 +137,7 @@ async def seed_database():
 @app.get("/info")
 async def info():
     """Get system information."""
-    from pathlib import Path
-    
-    yara_dir = Path(__file__).parent.parent / "data" / "yara_rules"
-    yara_rules = list(yara_dir.glob("*.yar")) if yara_dir.exists() else []
-    
+    yara_rules_count = _yara_rule_count()
     stats = await db.get_stats()
     
     return {
@@ -125,8 +145,8 @@ async def info():
         "version": "1.0.0",
         "features": {
             "signature_matching": True,
-            "yara_rules": len(yara_rules) > 0,
-            "yara_rules_count": len(yara_rules),
+            "yara_rules": yara_rules_count > 0,
+            "yara_rules_count": yara_rules_count,
             "file_scanning": True,
             "hash_lookup": True,
             "bulk_import": True,
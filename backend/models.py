@@ -57,7 +57,7 @@ class ScanResult(BaseModel):
     detected: bool
     malware_name: Optional[str] = None
     severity: Optional[str] = None
-    reason: str  # clean, signature_match, yara_match, skipped, error
+    reason: str  # clean, signature_match, yara_match, skipped, too_large, error
     timestamp: datetime
 
 
@@ -74,6 +74,7 @@ class BatchScanResponse(BaseModel):
     clean: int
     detected: int
     skipped: int
+    too_large: int = 0  # Archive members over the scan size limit, not checked
     results: List[ScanResult]
 
 
@@ -0,0 +1,18 @@
+"""
+Custom Response Classes
+"""
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Routes that return database rows as-is use this to skip building
+    Pydantic models just to serialize them again.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
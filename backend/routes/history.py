@@ -4,12 +4,33 @@ API Routes for History and Statistics
 
 from fastapi import APIRouter
 
-from models import HistoryResponse, StatsResponse, ScanResult, MessageResponse
+from models import HistoryResponse, StatsResponse, MessageResponse
 from database import db
+from responses import ORJSONResponse
 
 router = APIRouter(tags=["History & Stats"])
 
 
+def _to_scan_result(entry: dict) -> dict:
+    """
+    Shape a scan_history row like a serialized ScanResult.
+
+    Rows come from our own database with known column types, so they are
+    returned as plain dicts without building Pydantic models.
+    """
+    return {
+        'file_name': entry['file_name'],
+        'file_size': entry['file_size'] or 0,
+        'extension': entry['extension'] or '',
+        'hash': entry['hash'],
+        'detected': bool(entry['detected']),
+        'malware_name': entry['malware_name'],
+        'severity': entry['severity'],
+        'reason': entry['reason'] or 'unknown',
+        'timestamp': entry['timestamp']
+    }
+
+
 @router.get("/history", response_model=HistoryResponse)
 async def get_history(limit: int = 100, detections_only: bool = False):
     """
@@ -20,25 +41,12 @@ async def get_history(limit: int = 100, detections_only: bool = False):
     """
     entries = await db.get_history(limit=limit, detections_only=detections_only)
     
-    # Convert to ScanResult objects
-    results = []
-    for entry in entries:
-        results.append(ScanResult(
-            file_name=entry['file_name'],
-            file_size=entry['file_size'] or 0,
-            extension=entry['extension'] or '',
-            hash=entry['hash'],
-            detected=bool(entry['detected']),
-            malware_name=entry['malware_name'],
-            severity=entry['severity'],
-            reason=entry['reason'] or 'unknown',
-            timestamp=entry['timestamp']
-        ))
+    results = [_to_scan_result(entry) for entry in entries]
     
-    return HistoryResponse(
-        total=len(results),
-        entries=results
-    )
+    return ORJSONResponse({
+        "total": len(results),
+        "entries": results
+    })
 
 
 @router.delete("/history", response_model=MessageResponse)
@@ -59,23 +67,11 @@ async def get_stats():
     
     # Get recent detections
     recent = await db.get_history(limit=5, detections_only=True)
-    recent_results = []
-    for entry in recent:
-        recent_results.append(ScanResult(
-            file_name=entry['file_name'],
-            file_size=entry['file_size'] or 0,
-            extension=entry['extension'] or '',
-            hash=entry['hash'],
-            detected=bool(entry['detected']),
-            malware_name=entry['malware_name'],
-            severity=entry['severity'],
-            reason=entry['reason'] or 'unknown',
-            timestamp=entry['timestamp']
-        ))
+    recent_results = [_to_scan_result(entry) for entry in recent]
     
-    return StatsResponse(
-        total_signatures=stats['total_signatures'],
-        total_scans=stats['total_scans'],
-        total_detections=stats['total_detections'],
-        recent_detections=recent_results
-    )
+    return ORJSONResponse({
+        "total_signatures": stats['total_signatures'],
+        "total_scans": stats['total_scans'],
+        "total_detections": stats['total_detections'],
+        "recent_detections": recent_results
+    })
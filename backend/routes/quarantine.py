@@ -5,18 +5,25 @@ API Routes for Quarantine Management
 from fastapi import APIRouter, HTTPException
 from pathlib import Path
 from typing import Optional
-import json
+import asyncio
+import os
 import shutil
-from datetime import datetime
+import orjson
 
 from models import MessageResponse
+from database import db
+from responses import ORJSONResponse
 
 router = APIRouter(prefix="/quarantine", tags=["Quarantine"])
 
 
-# Quarantine storage
+# Quarantine storage (records live in the database, files on disk)
 QUARANTINE_DIR = Path(__file__).parent.parent / "data" / "quarantine"
-MANIFEST_FILE = QUARANTINE_DIR / "manifest.json"
+LEGACY_MANIFEST_FILE = QUARANTINE_DIR / "manifest.json"
+
+# Serializes multi-step mutations (lookup, file move/unlink, record delete)
+# so concurrent requests can't act on the same quarantined file at once.
+_lock = asyncio.Lock()
 
 
 def _ensure_dir():
@@ -24,27 +31,77 @@ def _ensure_dir():
     QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def _load_manifest() -> dict:
-    """Load quarantine manifest."""
-    _ensure_dir()
-    if MANIFEST_FILE.exists():
-        with open(MANIFEST_FILE, 'r') as f:
-            return json.load(f)
-    return {"files": {}, "metadata": {"created": datetime.now().isoformat()}}
+def _quarantine_path(file_hash: str) -> Path:
+    """Path of the quarantined file for a hash."""
+    return QUARANTINE_DIR / f"{file_hash[:16]}.quarantine"
 
 
-def _save_manifest(manifest: dict):
-    """Save quarantine manifest."""
-    _ensure_dir()
-    manifest["metadata"]["updated"] = datetime.now().isoformat()
-    with open(MANIFEST_FILE, 'w') as f:
-        json.dump(manifest, f, indent=2, default=str)
+def _do_move(source: Path, target: Path):
+    """Move a file, creating the target directory (blocking)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(source), str(target))
+
+
+def _unlink_if_exists(path: Path):
+    """Delete a file if it exists (blocking)."""
+    if path.exists():
+        path.unlink()
+
+
+def _delete_files(file_hashes: list):
+    """Delete quarantine files for the given hashes, ignoring errors (blocking)."""
+    # One directory listing instead of an exists() stat per hash
+    existing = {
+        entry.name: entry.path
+        for entry in os.scandir(QUARANTINE_DIR)
+        if entry.name.endswith(".quarantine")
+    }
+    for file_hash in file_hashes:
+        path = existing.get(f"{file_hash[:16]}.quarantine")
+        if path:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+async def _run_blocking(func, *args):
+    """Run blocking file I/O in the default thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def import_legacy_manifest() -> int:
+    """
+    One-time import of the old JSON manifest into the quarantine table.
+
+    The manifest is renamed afterwards so the import never runs twice.
+    Returns the number of records imported.
+    """
+    if not LEGACY_MANIFEST_FILE.exists():
+        return 0
+
+    manifest = orjson.loads(LEGACY_MANIFEST_FILE.read_bytes())
+    rows = [
+        (
+            file_hash,
+            info.get("original_name"),
+            info.get("malware_name"),
+            info.get("severity", "medium"),
+            info.get("original_path"),
+            info.get("quarantined_on")
+        )
+        for file_hash, info in manifest.get("files", {}).items()
+    ]
+
+    imported = await db.add_quarantined_bulk(rows)
+    LEGACY_MANIFEST_FILE.rename(LEGACY_MANIFEST_FILE.with_suffix(".json.imported"))
+    return imported
 
 
 # ============== Helper function for scanner ==============
 async def add_file_to_quarantine(
     file_hash: str,
-    original_name: str, 
+    original_name: str,
     malware_name: str,
     severity: str = "medium",
     original_path: str = None
@@ -52,64 +109,39 @@ async def add_file_to_quarantine(
     """
     Add a detected file to quarantine.
     Called by the scanner when malware is detected.
-    
+
     Returns True if added, False if already exists.
     """
-    manifest = _load_manifest()
-    
-    if file_hash in manifest["files"]:
-        return False  # Already in quarantine
-    
-    manifest["files"][file_hash] = {
-        "original_name": original_name,
-        "malware_name": malware_name,
-        "severity": severity,
-        "original_path": original_path,
-        "quarantined_on": datetime.now().isoformat()
-    }
-    
-    _save_manifest(manifest)
-    return True
+    return await db.add_quarantined(
+        hash=file_hash,
+        original_name=original_name,
+        malware_name=malware_name,
+        severity=severity,
+        original_path=original_path
+    )
 
 
 @router.get("")
 async def list_quarantined():
     """List all quarantined files."""
-    manifest = _load_manifest()
-    
-    files = []
-    for file_hash, info in manifest["files"].items():
-        files.append({
-            "hash": file_hash,
-            "original_name": info.get("original_name"),
-            "malware_name": info.get("malware_name"),
-            "severity": info.get("severity"),
-            "quarantined_on": info.get("quarantined_on"),
-            "original_path": info.get("original_path")
-        })
-    
-    return {
+    files = await db.list_quarantined()
+
+    return ORJSONResponse({
         "total": len(files),
         "files": files
-    }
+    })
 
 
 @router.get("/{hash}")
 async def get_quarantined(hash: str):
     """Get details of a quarantined file."""
-    manifest = _load_manifest()
-    
-    # Try exact match first
-    if hash in manifest["files"]:
-        return manifest["files"][hash]
-    
-    # Try partial match
-    matches = [h for h in manifest["files"] if h.startswith(hash)]
+    matches = await db.find_quarantined(hash)
+
     if len(matches) == 1:
-        return manifest["files"][matches[0]]
+        return matches[0]
     elif len(matches) > 1:
-        raise HTTPException(status_code=400, detail=f"Ambiguous hash: {len(matches)} matches found")
-    
+        raise HTTPException(status_code=400, detail="Ambiguous hash: multiple matches found")
+
     raise HTTPException(status_code=404, detail="Quarantined file not found")
 
 
@@ -122,21 +154,17 @@ async def add_to_quarantine(
     original_path: Optional[str] = None
 ):
     """Add a file to quarantine (metadata only - for tracking)."""
-    manifest = _load_manifest()
-    
-    if file_hash in manifest["files"]:
+    added = await db.add_quarantined(
+        hash=file_hash,
+        original_name=original_name,
+        malware_name=malware_name,
+        severity=severity,
+        original_path=original_path
+    )
+
+    if not added:
         raise HTTPException(status_code=400, detail="File already in quarantine")
-    
-    manifest["files"][file_hash] = {
-        "original_name": original_name,
-        "malware_name": malware_name,
-        "severity": severity,
-        "original_path": original_path,
-        "quarantined_on": datetime.now().isoformat()
-    }
-    
-    _save_manifest(manifest)
-    
+
     return MessageResponse(
         success=True,
         message=f"File '{original_name}' added to quarantine"
@@ -146,32 +174,21 @@ async def add_to_quarantine(
 @router.delete("/{hash}", response_model=MessageResponse)
 async def remove_from_quarantine(hash: str):
     """Remove a file from quarantine (and delete if exists)."""
-    manifest = _load_manifest()
-    
-    # Try exact match first
-    target_hash = None
-    if hash in manifest["files"]:
-        target_hash = hash
-    else:
-        # Try partial match
-        matches = [h for h in manifest["files"] if h.startswith(hash)]
-        if len(matches) == 1:
-            target_hash = matches[0]
-        elif len(matches) > 1:
-            raise HTTPException(status_code=400, detail=f"Ambiguous hash: {len(matches)} matches found")
-    
-    if not target_hash:
-        raise HTTPException(status_code=404, detail="Quarantined file not found")
-    
-    # Delete quarantine file if exists
-    quarantine_path = QUARANTINE_DIR / f"{target_hash[:16]}.quarantine"
-    if quarantine_path.exists():
-        quarantine_path.unlink()
-    
-    # Remove from manifest
-    del manifest["files"][target_hash]
-    _save_manifest(manifest)
-    
+    async with _lock:
+        matches = await db.find_quarantined(hash)
+
+        if len(matches) > 1:
+            raise HTTPException(status_code=400, detail="Ambiguous hash: multiple matches found")
+        if not matches:
+            raise HTTPException(status_code=404, detail="Quarantined file not found")
+
+        target_hash = matches[0]["hash"]
+
+        # Delete quarantine file if exists
+        await _run_blocking(_unlink_if_exists, _quarantine_path(target_hash))
+
+        await db.remove_quarantined(target_hash)
+
     return MessageResponse(
         success=True,
         message="File removed from quarantine"
@@ -181,69 +198,52 @@ async def remove_from_quarantine(hash: str):
 @router.post("/{hash}/restore", response_model=MessageResponse)
 async def restore_file(hash: str, restore_path: Optional[str] = None):
     """Restore a quarantined file (if it still exists)."""
-    manifest = _load_manifest()
-    
-    # Try exact match first
-    target_hash = None
-    if hash in manifest["files"]:
-        target_hash = hash
-    else:
-        matches = [h for h in manifest["files"] if h.startswith(hash)]
-        if len(matches) == 1:
-            target_hash = matches[0]
-    
-    if not target_hash:
-        raise HTTPException(status_code=404, detail="Quarantined file not found")
-    
-    file_info = manifest["files"][target_hash]
-    quarantine_path = QUARANTINE_DIR / f"{target_hash[:16]}.quarantine"
-    
-    if not quarantine_path.exists():
-        # File doesn't exist physically, just remove from manifest
-        del manifest["files"][target_hash]
-        _save_manifest(manifest)
-        return MessageResponse(
-            success=True,
-            message="File removed from quarantine records (file was already deleted)"
-        )
-    
-    # Determine target path
-    target = Path(restore_path) if restore_path else Path(file_info.get("original_path", "."))
-    
-    try:
-        target.parent.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(quarantine_path), str(target))
-        
-        del manifest["files"][target_hash]
-        _save_manifest(manifest)
-        
-        return MessageResponse(
-            success=True,
-            message=f"File restored to: {target}"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+    async with _lock:
+        matches = await db.find_quarantined(hash)
+
+        if len(matches) != 1:
+            raise HTTPException(status_code=404, detail="Quarantined file not found")
+
+        file_info = matches[0]
+        target_hash = file_info["hash"]
+        quarantine_path = _quarantine_path(target_hash)
+
+        if not quarantine_path.exists():
+            # File doesn't exist physically, just remove the record
+            await db.remove_quarantined(target_hash)
+            return MessageResponse(
+                success=True,
+                message="File removed from quarantine records (file was already deleted)"
+            )
+
+        # Determine target path
+        target = Path(restore_path) if restore_path else Path(file_info.get("original_path") or ".")
+
+        try:
+            await _run_blocking(_do_move, quarantine_path, target)
+
+            await db.remove_quarantined(target_hash)
+
+            return MessageResponse(
+                success=True,
+                message=f"File restored to: {target}"
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
 
 
 @router.delete("", response_model=MessageResponse)
 async def clear_quarantine():
     """Clear all quarantined files."""
-    manifest = _load_manifest()
-    count = len(manifest["files"])
-    
-    # Delete all quarantine files
-    for file_hash in list(manifest["files"].keys()):
-        quarantine_path = QUARANTINE_DIR / f"{file_hash[:16]}.quarantine"
-        try:
-            if quarantine_path.exists():
-                quarantine_path.unlink()
-        except Exception:
-            pass
-    
-    # Clear manifest
-    manifest["files"] = {}
-    _save_manifest(manifest)
-    
+    _ensure_dir()
+
+    async with _lock:
+        # Delete all quarantine files
+        entries = await db.list_quarantined()
+        await _run_blocking(_delete_files, [entry["hash"] for entry in entries])
+
+        count = await db.clear_quarantine()
+
     return MessageResponse(
         success=True,
         message=f"Cleared {count} quarantined files"
@@ -253,5 +253,4 @@ async def clear_quarantine():
 @router.get("/stats/count")
 async def quarantine_count():
     """Get count of quarantined files."""
-    manifest = _load_manifest()
-    return {"count": len(manifest["files"])}
+    return {"count": await db.count_quarantined()}
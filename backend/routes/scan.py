@@ -2,15 +2,44 @@
 API Routes for Scanning
 """
 
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List
 
 from models import ScanRequest, ScanResult, ScanResponse, BatchScanResponse
 from database import db
+from responses import ORJSONResponse
 from scanner import scanner_service
 
 router = APIRouter(prefix="/scan", tags=["Scanning"])
 
+# Uploaded files scanned concurrently by /scan/files
+FILE_SCAN_CONCURRENCY = 8
+
+
+def _batch_response(results: List[dict]) -> ORJSONResponse:
+    """
+    Summarize scan results as a serialized BatchScanResponse.
+
+    The scanner builds results with exactly the ScanResult fields, so they
+    are returned as plain dicts without validating every one into a model.
+    """
+    total = len(results)
+    detected = sum(1 for r in results if r['detected'])
+    skipped = sum(1 for r in results if r['reason'] == "skipped")
+    too_large = sum(1 for r in results if r['reason'] == "too_large")
+    clean = total - detected - skipped - too_large
+    
+    return ORJSONResponse({
+        "success": True,
+        "total": total,
+        "clean": clean,
+        "detected": detected,
+        "skipped": skipped,
+        "too_large": too_large,
+        "results": results
+    })
+
 
 @router.post("/file", response_model=BatchScanResponse)
 async def scan_file(
@@ -27,35 +56,15 @@ async def scan_file(
     all contents will be scanned. The response will contain results
     for each file found inside.
     """
-    content = await file.read()
-    
-    result = await scanner_service.scan_bytes(
-        data=content,
+    result = await scanner_service.scan_upload(
+        file_obj=file.file,
         filename=file.filename or "unknown",
         db=db,
         skip_non_suspicious=not scan_all
     )
     
     # Handle both single result and archive results (list)
-    if isinstance(result, list):
-        results = [ScanResult(**r) for r in result]
-    else:
-        results = [ScanResult(**result)]
-    
-    # Calculate summary
-    total = len(results)
-    detected = sum(1 for r in results if r.detected)
-    skipped = sum(1 for r in results if r.reason == "skipped")
-    clean = total - detected - skipped
-    
-    return BatchScanResponse(
-        success=True,
-        total=total,
-        clean=clean,
-        detected=detected,
-        skipped=skipped,
-        results=results
-    )
+    return _batch_response(result if isinstance(result, list) else [result])
 
 
 @router.post("/files", response_model=BatchScanResponse)
@@ -72,37 +81,30 @@ async def scan_files(
     Note: Archive files (ZIP) will be extracted and their contents
     scanned individually.
     """
-    results = []
+    semaphore = asyncio.Semaphore(FILE_SCAN_CONCURRENCY)
+    
+    async def scan_one(file: UploadFile):
+        async with semaphore:
+            return await scanner_service.scan_upload(
+                file_obj=file.file,
+                filename=file.filename or "unknown",
+                db=db,
+                skip_non_suspicious=not scan_all
+            )
+    
+    # Write scan history for the whole batch at once
+    async with db.batched_scan_logs():
+        scanned = await asyncio.gather(*(scan_one(file) for file in files))
     
-    for file in files:
-        content = await file.read()
-        result = await scanner_service.scan_bytes(
-            data=content,
-            filename=file.filename or "unknown",
-            db=db,
-            skip_non_suspicious=not scan_all
-        )
-        
+    results = []
+    for result in scanned:
         # Handle both single result and archive results (list)
         if isinstance(result, list):
-            results.extend([ScanResult(**r) for r in result])
+            results.extend(result)
         else:
-            results.append(ScanResult(**result))
-    
-    # Calculate summary
-    total = len(results)
-    detected = sum(1 for r in results if r.detected)
-    skipped = sum(1 for r in results if r.reason == "skipped")
-    clean = total - detected - skipped
+            results.append(result)
     
-    return BatchScanResponse(
-        success=True,
-        total=total,
-        clean=clean,
-        detected=detected,
-        skipped=skipped,
-        results=results
-    )
+    return _batch_response(results)
 
 
 @router.post("/hash", response_model=ScanResponse)
@@ -2,7 +2,11 @@
 API Routes for Signatures
 """
 
+import asyncio
+import orjson
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import List
 
 from models import (
@@ -10,10 +14,16 @@ from models import (
     MessageResponse, ErrorResponse
 )
 from database import db
+from responses import ORJSONResponse
 from scanner import scanner_service
 
 router = APIRouter(prefix="/signatures", tags=["Signatures"])
 
+VALID_SEVERITIES = frozenset({"low", "medium", "high", "critical"})
+
+# Bytes of export output collected before each write to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 
 @router.get("", response_model=SignatureListResponse)
 async def list_signatures(limit: int = 100, offset: int = 0):
@@ -21,10 +31,7 @@ async def list_signatures(limit: int = 100, offset: int = 0):
     signatures = await db.list_signatures(limit=limit, offset=offset)
     total = await db.count_signatures()
     
-    return SignatureListResponse(
-        total=total,
-        signatures=[SignatureResponse(**sig) for sig in signatures]
-    )
+    return ORJSONResponse({"total": total, "signatures": signatures})
 
 
 @router.get("/search", response_model=SignatureListResponse)
@@ -32,9 +39,39 @@ async def search_signatures(q: str):
     """Search signatures by name or hash."""
     signatures = await db.search_signatures(q)
     
-    return SignatureListResponse(
-        total=len(signatures),
-        signatures=[SignatureResponse(**sig) for sig in signatures]
+    return ORJSONResponse({"total": len(signatures), "signatures": signatures})
+
+
+# Must be registered before /{hash}, which would otherwise match "export"
+@router.get("/export")
+async def export_signatures():
+    """Export all signatures as JSON."""
+    
+    async def generate():
+        # Same document as {"signatures": {hash: sig}, "metadata": {...}},
+        # written row by row instead of built in memory first
+        yield b'{"signatures":{'
+        total = 0
+        chunk = bytearray()
+        async for sig in db.iter_signatures():
+            if total:
+                chunk += b','
+            chunk += orjson.dumps(sig['hash']) + b':' + orjson.dumps(sig)
+            total += 1
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield bytes(chunk)
+                chunk.clear()
+        metadata = {
+            "exported_on": datetime.now().isoformat(),
+            "total": total,
+            "source": "MalGuard Backend API"
+        }
+        yield bytes(chunk) + b'},"metadata":' + orjson.dumps(metadata) + b'}'
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/json",
+        headers={"Content-Disposition": "attachment; filename=signatures_export.json"}
     )
 
 
@@ -75,9 +112,10 @@ async def add_signature_from_file(
     severity: str = "medium"
 ):
     """Add a signature by uploading a malware sample."""
-    # Read file and calculate hash
-    content = await file.read()
-    file_hash = scanner_service.calculate_hash(content)
+    # Hash the upload in chunks without reading it into memory
+    file_hash = await asyncio.get_running_loop().run_in_executor(
+        None, scanner_service.calculate_hash_stream, file.file
+    )
     
     success = await db.add_signature(
         hash=file_hash,
@@ -112,34 +150,21 @@ async def remove_signature(hash: str):
 @router.get("/filter/severity/{severity}", response_model=SignatureListResponse)
 async def filter_by_severity(severity: str):
     """Filter signatures by severity level."""
-    if severity not in ["low", "medium", "high", "critical"]:
+    if severity not in VALID_SEVERITIES:
         raise HTTPException(status_code=400, detail="Invalid severity. Use: low, medium, high, critical")
     
     signatures = await db.filter_by_severity(severity)
     
-    return SignatureListResponse(
-        total=len(signatures),
-        signatures=[SignatureResponse(**sig) for sig in signatures]
-    )
+    return ORJSONResponse({"total": len(signatures), "signatures": signatures})
 
 
 @router.post("/bulk", response_model=MessageResponse)
 async def bulk_import(signatures: List[SignatureCreate]):
     """Import multiple signatures at once."""
-    added = 0
-    skipped = 0
-    
-    for sig in signatures:
-        success = await db.add_signature(
-            hash=sig.hash,
-            name=sig.name,
-            severity=sig.severity,
-            source=sig.source
-        )
-        if success:
-            added += 1
-        else:
-            skipped += 1
+    added = await db.add_signatures_bulk([
+        (sig.hash, sig.name, sig.severity, sig.source) for sig in signatures
+    ])
+    skipped = len(signatures) - added
     
     return MessageResponse(
         success=True,
@@ -150,45 +175,39 @@ async def bulk_import(signatures: List[SignatureCreate]):
 @router.post("/import-json")
 async def import_from_json(file: UploadFile = File(...)):
     """Import signatures from a JSON file."""
-    import json
-    
     content = await file.read()
     try:
-        data = json.loads(content.decode('utf-8'))
-    except json.JSONDecodeError:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON file")
     
-    signatures = data.get('signatures', data)
-    added = 0
-    skipped = 0
+    signatures = data.get('signatures', data) if isinstance(data, dict) else data
     
     if isinstance(signatures, dict):
         # Format: {hash: {name, severity, ...}}
-        for hash_key, sig_data in signatures.items():
-            if isinstance(sig_data, dict):
-                success = await db.add_signature(
-                    hash=hash_key,
-                    name=sig_data.get('name', 'Unknown'),
-                    severity=sig_data.get('severity', 'medium'),
-                    source=sig_data.get('source', 'import')
-                )
-                if success:
-                    added += 1
-                else:
-                    skipped += 1
-    else:
+        entries = [
+            (hash_key, sig_data)
+            for hash_key, sig_data in signatures.items()
+            if isinstance(sig_data, dict)
+        ]
+    elif isinstance(signatures, list):
         # Format: [{hash, name, ...}, ...]
-        for sig in signatures:
-            success = await db.add_signature(
-                hash=sig.get('hash'),
-                name=sig.get('name', 'Unknown'),
-                severity=sig.get('severity', 'medium'),
-                source=sig.get('source', 'import')
-            )
-            if success:
-                added += 1
-            else:
-                skipped += 1
+        entries = [(sig.get('hash'), sig) for sig in signatures if isinstance(sig, dict)]
+    else:
+        raise HTTPException(status_code=400, detail="Invalid signatures format")
+    
+    rows = [
+        (
+            hash_key,
+            sig_data.get('name', 'Unknown'),
+            sig_data.get('severity', 'medium'),
+            sig_data.get('source', 'import')
+        )
+        for hash_key, sig_data in entries
+        if hash_key
+    ]
+    added = await db.add_signatures_bulk(rows)
+    skipped = len(entries) - added
     
     return MessageResponse(
         success=True,
@@ -196,29 +215,6 @@ async def import_from_json(file: UploadFile = File(...)):
     )
 
 
-@router.get("/export")
-async def export_signatures():
-    """Export all signatures as JSON."""
-    from fastapi.responses import JSONResponse
-    from datetime import datetime
-    
-    signatures = await db.list_signatures(limit=10000)
-    
-    export_data = {
-        "signatures": {sig['hash']: sig for sig in signatures},
-        "metadata": {
-            "exported_on": datetime.now().isoformat(),
-            "total": len(signatures),
-            "source": "MalGuard Backend API"
-        }
-    }
-    
-    return JSONResponse(
-        content=export_data,
-        headers={"Content-Disposition": "attachment; filename=signatures_export.json"}
-    )
-
-
 @router.delete("/all", response_model=MessageResponse)
 async def clear_all_signatures():
     """Remove all signatures from the database."""
@@ -3,14 +3,21 @@ Scanner Service
 File scanning logic for the API.
 """
 
+import asyncio
 import hashlib
+import os
+import re
+import sys
 import zipfile
 import io
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, BinaryIO, Union, Callable, Awaitable
 
-from config import SUSPICIOUS_EXTENSIONS, YARA_RULES_DIR
+from config import MAX_SCAN_SIZE, SUSPICIOUS_EXTENSIONS, YARA_RULES_DIR
 
 # Optional YARA support
 try:
@@ -19,8 +26,142 @@ try:
 except ImportError:
     YARA_AVAILABLE = False
 
+# hashlib.file_digest (3.11+) runs the read/update loop in C
+HAS_FILE_DIGEST = sys.version_info >= (3, 11)
+
+# Read size for hashing files where file_digest isn't available
+HASH_CHUNK_SIZE = 1 << 20
+
 # Supported archive extensions
-ARCHIVE_EXTENSIONS = {'.zip'}
+ARCHIVE_EXTENSIONS = frozenset({'.zip'})
+
+# Longest entries of the extension sets, for _has_extension()
+_SUSPICIOUS_MAX_LEN = max(map(len, SUSPICIOUS_EXTENSIONS))
+_ARCHIVE_MAX_LEN = max(map(len, ARCHIVE_EXTENSIONS))
+
+# Archive members are hashed and looked up in batches of this size, which
+# also bounds how many extracted members are held in memory at once
+ARCHIVE_BATCH_SIZE = 64
+
+# A batch is also scanned once its extracted content reaches this many
+# bytes, and members this large are scanned on their own, so at most one
+# large member is held in memory at a time
+ARCHIVE_BATCH_BYTES = 8 * 1024 * 1024
+
+# Archive members scanned concurrently within a batch
+ARCHIVE_SCAN_CONCURRENCY = 16
+
+# Spooled uploads at least this large are memory-mapped for YARA instead of
+# being read into a bytes copy
+YARA_MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# SHA-256 and YARA matching release the GIL, so hashing and rule matching
+# run in parallel across cores in this pool
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="scanner")
+
+# Timestamp shared by every result of the scan in progress, so an archive
+# with thousands of members doesn't read the clock once per member
+_scan_timestamp: ContextVar[Optional[datetime]] = ContextVar("scan_timestamp", default=None)
+
+
+async def _run_blocking(func, *args):
+    """Run blocking hashing, YARA matching or file I/O in the scanner thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+def _timestamp() -> datetime:
+    """Timestamp of the current scan, or now outside of one."""
+    return _scan_timestamp.get() or datetime.now()
+
+
+def _extension(filename: str) -> str:
+    """
+    Lowercased extension of a file or archive member name.
+    
+    Same result as Path(filename).suffix.lower() (dotfiles and trailing
+    dots have no extension) without building a Path per archive member.
+    """
+    name = filename.rpartition('/')[2].rpartition('\\')[2]
+    dot = name.rfind('.')
+    if dot <= 0 or dot == len(name) - 1:
+        return ''
+    return name[dot:].lower()
+
+
+def _has_extension(filename: str, extensions: frozenset, max_len: int) -> bool:
+    """
+    Whether _extension(filename) is in `extensions`, whose longest entry
+    is `max_len` characters.
+    
+    Only the last `max_len` characters can hold a matching extension, so
+    the dot is searched for there and only that tail is lowercased.
+    """
+    dot = filename.rfind('.', max(len(filename) - max_len, 0))
+    if dot <= 0 or filename[dot - 1] in '/\\':
+        return False
+    return filename[dot:].lower() in extensions
+
+
+def _read_all(file_obj: BinaryIO) -> bytes:
+    """Read a file object from the start (blocking)."""
+    file_obj.seek(0)
+    return file_obj.read()
+
+
+# A rule whose whole condition is one or more `hash.sha256(0, filesize) == "..."`
+# comparisons (with at most a meta section before it) is really a signature
+_SHA256_TEST = r'hash\.sha256\(\s*0\s*,\s*filesize\s*\)\s*==\s*"[0-9a-fA-F]{64}"'
+_HASH_RULE_RE = re.compile(
+    r'^[ \t]*rule[ \t]+(?P<name>\w+)(?:[ \t]*:[\w \t]+)?\s*\{'
+    r'(?:\s*meta:(?P<meta>(?:\s*\w+\s*=\s*(?:"(?:[^"\\\n]|\\.)*"|-?\d+|true|false))*))?'
+    rf'\s*condition:\s*(?P<condition>{_SHA256_TEST}(?:\s+or\s+{_SHA256_TEST})*)\s*\}}',
+    re.MULTILINE
+)
+_SHA256_VALUE_RE = re.compile(r'"([0-9a-fA-F]{64})"')
+_SEVERITY_META_RE = re.compile(r'\bseverity\s*=\s*"(\w+)"')
+_INCLUDE_RE = re.compile(r'^\s*include\s+"', re.MULTILINE)
+
+# Compiled rules cached in YARA_RULES_DIR, plus the fingerprint of the rule
+# files they were built from
+COMPILED_RULES_NAME = ".compiled.yarc"
+COMPILED_KEY_NAME = ".compiled.yarc.key"
+
+
+def _split_hash_rules(source: str):
+    """
+    Split hash-only rules out of YARA source.
+    
+    Returns the remaining source and a {sha256 hex: (rule name, severity)} dict.
+    """
+    hash_rules = {}
+    
+    def take(match):
+        severity = _SEVERITY_META_RE.search(match['meta'] or '')
+        for value in _SHA256_VALUE_RE.findall(match['condition']):
+            hash_rules[value.lower()] = (match['name'], severity[1] if severity else 'medium')
+        return ''
+    
+    return _HASH_RULE_RE.sub(take, source), hash_rules
+
+
+def _sha256_file(file_obj: BinaryIO):
+    """SHA-256 hash object over a binary file object read from its current position."""
+    if HAS_FILE_DIGEST:
+        return hashlib.file_digest(file_obj, 'sha256')
+    hasher = hashlib.sha256()
+    read = file_obj.read
+    while chunk := read(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    return hasher
+
+
+def _rules_fingerprint(rule_files: List[Path]) -> str:
+    """Fingerprint of the rule files (path, mtime, size) and the yara version."""
+    hasher = hashlib.sha256(yara.__version__.encode())
+    for rule_file in sorted(rule_files):
+        stat = rule_file.stat()
+        hasher.update(f"{rule_file}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return hasher.hexdigest()
 
 
 class ScannerService:
@@ -28,11 +169,38 @@ class ScannerService:
     
     def __init__(self):
         self.yara_rules = None
-        if YARA_AVAILABLE:
-            self._compile_yara_rules()
+        # sha256 hex -> (rule name, severity) for rules that only compare the hash
+        self.hash_rules: Dict[str, tuple] = {}
+        # Coroutine that quarantines detected files, set by the app at startup
+        self._quarantine_handler: Optional[Callable[..., Awaitable[Any]]] = None
+        self._compile_yara_rules()
+        if self.yara_rules is not None and not any(True for _ in self.yara_rules):
+            # Only hash rules were defined, so no file needs a YARA pass
+            self.yara_rules = None
+    
+    def register_quarantine_handler(self, handler: Callable[..., Awaitable[Any]]):
+        """
+        Set the coroutine function called for every detected file, with
+        file_hash, original_name, malware_name and severity keywords.
+        
+        Without one, detections are only logged.
+        """
+        self._quarantine_handler = handler
+    
+    async def _quarantine(self, **details):
+        """Hand a detected file to the registered quarantine handler."""
+        if self._quarantine_handler is not None:
+            await self._quarantine_handler(**details)
     
     def _compile_yara_rules(self):
-        """Compile YARA rules from directory."""
+        """
+        Compile YARA rules from directory.
+        
+        Rules that only compare the file's SHA-256 are split out into
+        `hash_rules` and registered as plain signatures at startup (see
+        register_hash_rules) instead of running through YARA for every file.
+        That part works without yara-python too.
+        """
         if not YARA_RULES_DIR.exists():
             return
         
@@ -40,40 +208,137 @@ class ScannerService:
         if not rule_files:
             return
         
+        filepaths = {f"rule_{i}": str(f) for i, f in enumerate(rule_files)}
+        try:
+            texts = [f.read_text(encoding="utf-8", errors="replace") for f in rule_files]
+        except OSError as e:
+            print(f"Warning: Failed to read YARA rules: {e}")
+            return
+        
+        # Relative includes only resolve when compiling from file paths
+        if YARA_AVAILABLE and any(_INCLUDE_RE.search(text) for text in texts):
+            sources = None
+        else:
+            sources = {}
+            for namespace, text in zip(filepaths, texts):
+                sources[namespace], hash_rules = _split_hash_rules(text)
+                self.hash_rules.update(hash_rules)
+        
+        if not YARA_AVAILABLE:
+            return
+        
         try:
-            filepaths = {f"rule_{i}": str(f) for i, f in enumerate(rule_files)}
-            self.yara_rules = yara.compile(filepaths=filepaths)
+            if sources is None:
+                self.yara_rules = yara.compile(filepaths=filepaths)
+                return
+            
+            fingerprint = _rules_fingerprint(rule_files)
+            self.yara_rules = self._load_compiled_rules(fingerprint)
+            if self.yara_rules is not None:
+                return
+            
+            try:
+                self.yara_rules = yara.compile(sources=sources)
+            except yara.SyntaxError:
+                # A remaining rule references an extracted one; keep them all in YARA
+                self.hash_rules = {}
+                self.yara_rules = yara.compile(filepaths=filepaths)
+                return
+            self._save_compiled_rules(fingerprint)
         except Exception as e:
             print(f"Warning: Failed to compile YARA rules: {e}")
     
+    def _load_compiled_rules(self, fingerprint: str):
+        """Load the cached compiled rules if they were built from the current files."""
+        try:
+            if (YARA_RULES_DIR / COMPILED_KEY_NAME).read_text() == fingerprint:
+                return yara.load(str(YARA_RULES_DIR / COMPILED_RULES_NAME))
+        except (OSError, yara.Error):
+            pass
+        return None
+    
+    def _save_compiled_rules(self, fingerprint: str):
+        """Cache the compiled rules so other workers and restarts can skip compiling."""
+        compiled_file = YARA_RULES_DIR / COMPILED_RULES_NAME
+        temp_file = compiled_file.with_name(f"{COMPILED_RULES_NAME}.{os.getpid()}.tmp")
+        try:
+            self.yara_rules.save(str(temp_file))
+            os.replace(temp_file, compiled_file)
+            (YARA_RULES_DIR / COMPILED_KEY_NAME).write_text(fingerprint)
+        except (OSError, yara.Error) as e:
+            print(f"Warning: Failed to cache compiled YARA rules: {e}")
+    
+    async def register_hash_rules(self, db) -> int:
+        """
+        Add the hash-only YARA rules to the signature database.
+        
+        Returns:
+            Number of new signatures (existing hashes are left untouched)
+        """
+        rows = [
+            (file_hash, name, severity, "yara")
+            for file_hash, (name, severity) in self.hash_rules.items()
+        ]
+        return await db.add_signatures_bulk(rows)
+    
     @staticmethod
     def calculate_hash(data: bytes) -> str:
         """Calculate SHA-256 hash of bytes."""
         return hashlib.sha256(data).hexdigest()
     
+    @staticmethod
+    def calculate_digest(data: bytes) -> bytes:
+        """Calculate the raw 32-byte SHA-256 digest of bytes."""
+        return hashlib.sha256(data).digest()
+    
+    @staticmethod
+    def calculate_digest_stream(file_obj: BinaryIO) -> bytes:
+        """Calculate the raw SHA-256 digest of a binary file object, reading it in chunks."""
+        file_obj.seek(0)
+        return _sha256_file(file_obj).digest()
+    
+    @classmethod
+    def calculate_hash_stream(cls, file_obj: BinaryIO) -> str:
+        """Calculate SHA-256 hash of a binary file object, reading it in chunks."""
+        return cls.calculate_digest_stream(file_obj).hex()
+    
     @staticmethod
     def calculate_file_hash(file_path: Path) -> Optional[str]:
         """Calculate SHA-256 hash of a file."""
         try:
-            hasher = hashlib.sha256()
             with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+                return _sha256_file(f).hexdigest()
         except Exception:
             return None
     
     @staticmethod
     def is_suspicious_extension(filename: str) -> bool:
         """Check if file has suspicious extension."""
-        ext = Path(filename).suffix.lower()
-        return ext in SUSPICIOUS_EXTENSIONS
+        return _has_extension(filename, SUSPICIOUS_EXTENSIONS, _SUSPICIOUS_MAX_LEN)
     
     @staticmethod
     def is_archive(filename: str) -> bool:
         """Check if file is a supported archive."""
-        ext = Path(filename).suffix.lower()
-        return ext in ARCHIVE_EXTENSIONS
+        return _has_extension(filename, ARCHIVE_EXTENSIONS, _ARCHIVE_MAX_LEN)
+    
+    def scan_yara_stream(self, file_obj: BinaryIO, file_size: int) -> Optional[str]:
+        """
+        Scan a binary file object with YARA rules (blocking).
+        
+        Large files backed by a real file (rolled-over upload spools) are
+        scanned through a read-only mmap, so the kernel pages them in on
+        demand instead of the whole file being copied into memory.
+        """
+        if file_size >= YARA_MMAP_THRESHOLD:
+            try:
+                fileno = file_obj.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                fileno = None
+            if fileno is not None:
+                file_obj.flush()
+                with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+                    return self.scan_yara(mapped)
+        return self.scan_yara(_read_all(file_obj))
     
     def scan_yara(self, data: bytes) -> Optional[str]:
         """Scan bytes with YARA rules."""
@@ -89,14 +354,14 @@ class ScannerService:
         
         return None
     
-    async def extract_and_scan_archive(self, data: bytes, archive_name: str, 
+    async def extract_and_scan_archive(self, data: Union[bytes, BinaryIO], archive_name: str, 
                                        db, skip_non_suspicious: bool = True,
                                        max_depth: int = 3, current_depth: int = 0) -> List[Dict[str, Any]]:
         """
         Extract and scan contents of a ZIP archive.
         
         Args:
-            data: Archive content as bytes
+            data: Archive content as bytes or a seekable binary file object
             archive_name: Name of the archive file
             db: Database instance for signature lookup
             skip_non_suspicious: Skip non-executable files
@@ -107,24 +372,50 @@ class ScannerService:
             List of scan results for all files in the archive
         """
         results = []
+        pending = []  # (filename, content, size) waiting for a batched lookup
+        pending_bytes = 0
         
         if current_depth >= max_depth:
             return results
         
+        async def flush():
+            nonlocal pending_bytes
+            results.extend(await self._scan_members(pending, db, skip_non_suspicious))
+            pending.clear()
+            pending_bytes = 0
+        
         try:
-            with zipfile.ZipFile(io.BytesIO(data), 'r') as zf:
+            if isinstance(data, bytes):
+                source = io.BytesIO(data)
+            elif not hasattr(data, 'seekable'):
+                # SpooledTemporaryFile has no seekable() before Python 3.11,
+                # which zipfile needs; the file it wraps has
+                source = data._file
+            else:
+                source = data
+            with zipfile.ZipFile(source, 'r') as zf:
                 for file_info in zf.infolist():
                     # Skip directories
                     if file_info.is_dir():
                         continue
                     
                     try:
-                        # Extract file content
-                        file_content = zf.read(file_info.filename)
                         inner_filename = f"{archive_name}/{file_info.filename}"
                         
+                        if (file_info.file_size > MAX_SCAN_SIZE
+                                and not self._would_skip(file_info.filename, skip_non_suspicious)):
+                            # Too large to extract; reported as such rather
+                            # than as a skip, since it wasn't checked
+                            await flush()
+                            result = self._new_result(inner_filename, file_info.file_size)
+                            result['reason'] = 'too_large'
+                            await db.log_scan(result)
+                            results.append(result)
                         # Check if it's a nested archive
-                        if self.is_archive(file_info.filename) and current_depth < max_depth - 1:
+                        elif self.is_archive(file_info.filename) and current_depth < max_depth - 1:
+                            # Keep results in archive order
+                            await flush()
+                            file_content = zf.read(file_info.filename)
                             # Recursively scan nested archive
                             nested_results = await self.extract_and_scan_archive(
                                 data=file_content,
@@ -135,28 +426,35 @@ class ScannerService:
                                 current_depth=current_depth + 1
                             )
                             results.extend(nested_results)
+                        elif skip_non_suspicious and not self.is_suspicious_extension(file_info.filename):
+                            # Will be skipped anyway, don't decompress it
+                            pending.append((inner_filename, None, file_info.file_size))
                         else:
-                            # Scan the extracted file
-                            result = await self._scan_single_file(
-                                data=file_content,
-                                filename=inner_filename,
-                                db=db,
-                                skip_non_suspicious=skip_non_suspicious
-                            )
-                            results.append(result)
+                            if file_info.file_size >= ARCHIVE_BATCH_BYTES:
+                                # Release the batch before extracting a large member
+                                await flush()
+                            file_content = zf.read(file_info.filename)
+                            pending.append((inner_filename, file_content, len(file_content)))
+                            pending_bytes += len(file_content)
+                            if (len(pending) >= ARCHIVE_BATCH_SIZE
+                                    or pending_bytes >= ARCHIVE_BATCH_BYTES):
+                                await flush()
                     except Exception as e:
                         # Log error but continue with other files
+                        await flush()
                         results.append({
                             'file_name': f"{archive_name}/{file_info.filename}",
                             'file_size': file_info.file_size,
-                            'extension': Path(file_info.filename).suffix.lower(),
+                            'extension': _extension(file_info.filename),
                             'hash': None,
                             'detected': False,
                             'malware_name': None,
                             'severity': None,
                             'reason': f'extraction_error: {str(e)}',
-                            'timestamp': datetime.now()
+                            'timestamp': _timestamp()
                         })
+                
+                await flush()
         except zipfile.BadZipFile:
             # Not a valid ZIP file or corrupted
             pass
@@ -165,28 +463,109 @@ class ScannerService:
         
         return results
     
-    async def _scan_single_file(self, data: bytes, filename: str,
-                                db, skip_non_suspicious: bool = True) -> Dict[str, Any]:
+    async def _scan_members(self, members: List[tuple], db,
+                            skip_non_suspicious: bool = True) -> List[Dict[str, Any]]:
         """
-        Scan a single file's bytes (internal method).
+        Scan extracted (filename, content, size) archive members.
+        
+        Members whose content is None were not extracted because they are
+        skipped; only their skip result is logged.
+        
+        All members are hashed first (in parallel, in the thread pool) so
+        their signatures can be fetched with a single bulk lookup, then
+        scanned concurrently. Results keep the order of `members`.
         """
-        # Import here to avoid circular imports
-        from routes.quarantine import add_file_to_quarantine
+        if not members:
+            return []
         
-        file_size = len(data)
-        extension = Path(filename).suffix.lower()
+        async def hash_member(filename: str, content: Optional[bytes]) -> Optional[bytes]:
+            if content is None or (skip_non_suspicious and not self.is_suspicious_extension(filename)):
+                return None
+            return await _run_blocking(self.calculate_digest, content)
         
-        result = {
+        digests = await asyncio.gather(
+            *(hash_member(filename, content) for filename, content, _ in members)
+        )
+        signatures = await db.get_signatures_bulk([d for d in digests if d])
+        
+        semaphore = asyncio.Semaphore(ARCHIVE_SCAN_CONCURRENCY)
+        
+        async def scan_member(filename: str, content: Optional[bytes], size: int,
+                              digest: Optional[bytes]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    if content is None:
+                        result = self._new_result(filename, size)
+                        result['reason'] = 'skipped'
+                        await db.log_scan(result)
+                        return result
+                    return await self._scan_single_file(
+                        data=content,
+                        filename=filename,
+                        db=db,
+                        skip_non_suspicious=skip_non_suspicious,
+                        digest=digest,
+                        signatures=signatures
+                    )
+                except Exception as e:
+                    return {
+                        'file_name': filename,
+                        'file_size': size,
+                        'extension': _extension(filename),
+                        'hash': None,
+                        'detected': False,
+                        'malware_name': None,
+                        'severity': None,
+                        'reason': f'extraction_error: {str(e)}',
+                        'timestamp': _timestamp()
+                    }
+        
+        return list(await asyncio.gather(*(
+            scan_member(filename, content, size, digest)
+            for (filename, content, size), digest in zip(members, digests)
+        )))
+    
+    def _would_skip(self, filename: str, skip_non_suspicious: bool) -> bool:
+        """Whether an archive member would be skipped without being scanned."""
+        return (skip_non_suspicious and not self.is_suspicious_extension(filename)
+                and not self.is_archive(filename))
+    
+    @staticmethod
+    def _new_result(filename: str, file_size: int) -> Dict[str, Any]:
+        """Start a clean scan result for a file."""
+        return {
             'file_name': filename,
             'file_size': file_size,
-            'extension': extension,
+            'extension': _extension(filename),
             'hash': None,
             'detected': False,
             'malware_name': None,
             'severity': None,
             'reason': 'clean',
-            'timestamp': datetime.now()
+            'timestamp': _timestamp()
         }
+    
+    async def _scan_single_file(self, data: Union[bytes, BinaryIO], filename: str,
+                                db, skip_non_suspicious: bool = True,
+                                digest: Optional[bytes] = None,
+                                signatures: Optional[Dict[bytes, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Scan a single file's bytes (internal method).
+        
+        `data` may also be a seekable binary file object (an upload spool).
+        It is hashed in chunks and only read into memory if YARA needs it
+        (large on-disk spools are memory-mapped instead).
+        Batch callers pass the precomputed `digest` and the `signatures`
+        found by a bulk lookup, which replaces the per-file database query.
+        Lookups use the raw 32-byte digest; hex is only produced for the result.
+        """
+        in_memory = isinstance(data, bytes)
+        if in_memory:
+            file_size = len(data)
+        else:
+            file_size = data.seek(0, io.SEEK_END)
+        
+        result = self._new_result(filename, file_size)
         
         # Skip non-suspicious files if requested
         if skip_non_suspicious and not self.is_suspicious_extension(filename):
@@ -195,41 +574,56 @@ class ScannerService:
             return result
         
         # Calculate hash
-        file_hash = self.calculate_hash(data)
+        if digest is None:
+            if in_memory:
+                digest = self.calculate_digest(data)
+            else:
+                digest = await _run_blocking(self.calculate_digest_stream, data)
+        file_hash = digest.hex()
         result['hash'] = file_hash
         
-        # Check signature database
-        signature = await db.get_signature(file_hash)
+        # Check the signature database (hash-only YARA rules are in it too)
+        if signatures is not None:
+            signature = signatures.get(digest)
+        else:
+            signature = await db.get_signature(digest)
         if signature:
             result['detected'] = True
             result['malware_name'] = signature['name']
             result['severity'] = signature.get('severity', 'medium')
             result['reason'] = 'signature_match'
-            await db.log_scan(result)
-            # Auto-add to quarantine
-            await add_file_to_quarantine(
-                file_hash=file_hash,
-                original_name=filename,
-                malware_name=signature['name'],
-                severity=signature.get('severity', 'medium')
-            )
+            # Log and auto-add to quarantine in one transaction
+            async with db.transaction():
+                await db.log_scan(result, flush=True)
+                await self._quarantine(
+                    file_hash=file_hash,
+                    original_name=filename,
+                    malware_name=signature['name'],
+                    severity=signature.get('severity', 'medium')
+                )
             return result
         
         # Check YARA rules
-        yara_match = self.scan_yara(data)
+        yara_match = None
+        if YARA_AVAILABLE and self.yara_rules is not None:
+            if in_memory:
+                yara_match = await _run_blocking(self.scan_yara, data)
+            else:
+                yara_match = await _run_blocking(self.scan_yara_stream, data, file_size)
         if yara_match:
             result['detected'] = True
             result['malware_name'] = yara_match
             result['severity'] = 'medium'
             result['reason'] = 'yara_match'
-            await db.log_scan(result)
-            # Auto-add to quarantine
-            await add_file_to_quarantine(
-                file_hash=file_hash,
-                original_name=filename,
-                malware_name=yara_match,
-                severity='medium'
-            )
+            # Log and auto-add to quarantine in one transaction
+            async with db.transaction():
+                await db.log_scan(result, flush=True)
+                await self._quarantine(
+                    file_hash=file_hash,
+                    original_name=filename,
+                    malware_name=yara_match,
+                    severity='medium'
+                )
             return result
         
         # Clean file - also log to history
@@ -237,14 +631,14 @@ class ScannerService:
         await db.log_scan(result)  # Log clean files too
         return result
     
-    async def scan_bytes(self, data: bytes, filename: str, 
+    async def scan_bytes(self, data: Union[bytes, BinaryIO], filename: str, 
                         db, skip_non_suspicious: bool = True,
                         scan_archives: bool = True) -> Dict[str, Any] | List[Dict[str, Any]]:
         """
         Scan file bytes for malware.
         
         Args:
-            data: File content as bytes
+            data: File content as bytes or a seekable binary file object
             filename: Original filename
             db: Database instance for signature lookup
             skip_non_suspicious: Skip non-executable files
@@ -253,24 +647,49 @@ class ScannerService:
         Returns:
             Scan result dictionary or list of results for archives
         """
-        # Check if this is an archive that should be extracted
-        if scan_archives and self.is_archive(filename):
-            archive_results = await self.extract_and_scan_archive(
+        # All results of this scan share one timestamp
+        token = _scan_timestamp.set(_timestamp())
+        try:
+            # Check if this is an archive that should be extracted
+            if scan_archives and self.is_archive(filename):
+                # One history write for all members instead of one per member
+                async with db.batched_scan_logs():
+                    archive_results = await self.extract_and_scan_archive(
+                        data=data,
+                        archive_name=filename,
+                        db=db,
+                        skip_non_suspicious=skip_non_suspicious
+                    )
+                if archive_results:
+                    return archive_results
+                # If archive was empty or couldn't be read, scan the archive file itself
+            
+            # Scan as regular file
+            return await self._scan_single_file(
                 data=data,
-                archive_name=filename,
+                filename=filename,
                 db=db,
                 skip_non_suspicious=skip_non_suspicious
             )
-            if archive_results:
-                return archive_results
-            # If archive was empty or couldn't be read, scan the archive file itself
+        finally:
+            _scan_timestamp.reset(token)
+    
+    async def scan_upload(self, file_obj: BinaryIO, filename: str,
+                          db, skip_non_suspicious: bool = True,
+                          scan_archives: bool = True) -> Dict[str, Any] | List[Dict[str, Any]]:
+        """
+        Scan an uploaded file object without reading it into memory up front.
         
-        # Scan as regular file
-        return await self._scan_single_file(
-            data=data,
+        Regular files are hashed straight from the upload spool and archives
+        are opened in place, so only archive members and files that need a
+        YARA pass are ever held in memory.
+        """
+        return await self.scan_bytes(
+            data=file_obj,
             filename=filename,
             db=db,
-            skip_non_suspicious=skip_non_suspicious
+            skip_non_suspicious=skip_non_suspicious,
+            scan_archives=scan_archives
         )
     
     async def check_hash(self, file_hash: str, db) -> Dict[str, Any]:
@@ -290,7 +709,7 @@ class ScannerService:
             'malware_name': None,
             'severity': None,
             'reason': 'not_found',
-            'timestamp': datetime.now()
+            'timestamp': _timestamp()
         }
         
         signature = await db.get_signature(file_hash)
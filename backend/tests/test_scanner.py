@@ -0,0 +1,92 @@
+"""Archive scanning in ScannerService, against an in-memory database."""
+
+import asyncio
+import io
+import tempfile
+import zipfile
+
+import scanner
+from scanner import ScannerService
+
+
+class FakeDatabase:
+    """The parts of Database the scanner uses, with no signatures."""
+    
+    def __init__(self):
+        self.logged = []
+    
+    async def log_scan(self, result, flush=False):
+        self.logged.append(result)
+    
+    async def get_signatures_bulk(self, digests):
+        return {}
+    
+    async def get_signature(self, digest):
+        return None
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_oversized_member_is_too_large_not_skipped(monkeypatch):
+    monkeypatch.setattr(scanner, 'MAX_SCAN_SIZE', 100)
+    data = make_zip({
+        'big.exe': bytes(500),
+        'big.txt': bytes(500),
+        'small.exe': bytes(50),
+    })
+    db = FakeDatabase()
+    
+    results = asyncio.run(ScannerService().extract_and_scan_archive(data, 'test.zip', db))
+    reasons = {r['file_name']: (r['reason'], r['file_size']) for r in results}
+    
+    # Too large to check, with its size reported
+    assert reasons['test.zip/big.exe'] == ('too_large', 500)
+    # Wouldn't have been scanned at any size
+    assert reasons['test.zip/big.txt'] == ('skipped', 500)
+    assert reasons['test.zip/small.exe'][0] == 'clean'
+    assert [r['file_name'] for r in results] == [
+        'test.zip/big.exe', 'test.zip/big.txt', 'test.zip/small.exe']
+    assert len(db.logged) == 3
+
+
+def test_spooled_upload_is_extracted():
+    # An upload as FastAPI hands it over, not yet rolled over to disk
+    upload = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    upload.write(make_zip({'a.exe': b'MZ' + bytes(50), 'b.exe': bytes(50)}))
+    upload.seek(0)
+    
+    results = asyncio.run(ScannerService().extract_and_scan_archive(upload, 'test.zip', FakeDatabase()))
+    
+    assert [r['reason'] for r in results] == ['clean', 'clean']
+
+
+def test_batches_are_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(scanner, 'ARCHIVE_BATCH_BYTES', 100)
+    data = make_zip({
+        'a.exe': bytes(40),
+        'b.exe': bytes(40),
+        'big.exe': bytes(150),
+        'c.exe': bytes(40),
+        'd.exe': bytes(40),
+        'e.exe': bytes(40),
+    })
+    service = ScannerService()
+    batches = []
+    scan_members = service._scan_members
+    
+    async def record(members, *args):
+        batches.append([name.rpartition('/')[2] for name, _, _ in members])
+        return await scan_members(members, *args)
+    
+    monkeypatch.setattr(service, '_scan_members', record)
+    results = asyncio.run(service.extract_and_scan_archive(data, 'test.zip', FakeDatabase()))
+    
+    assert [b for b in batches if b] == [
+        ['a.exe', 'b.exe'], ['big.exe'], ['c.exe', 'd.exe', 'e.exe']]
+    assert len(results) == 6
@@ -16,24 +16,61 @@ Usage:
     python main.py quarantine restore <hash> # Restore a quarantined file
 """
 
+from __future__ import annotations
+
 import argparse
 import json
+import logging
 import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from malguard import Scanner, SignatureDatabase, ScanLogger
-from malguard.hasher import FileHasher
-from malguard.utils import get_config_dir, format_file_size
+from malguard.utils import get_config_dir, format_file_size, dumps_json, loads_json
 from malguard.colors import green, red, yellow, cyan, dim, Colors
-from malguard.quarantine import QuarantineManager
+
+# Components are imported by the commands that use them, so e.g. 'list'
+# doesn't pay for importing the scanner and YARA
+if TYPE_CHECKING:
+    from malguard.database import SignatureDatabase
+    from malguard.logger import ScanLogger
+    from malguard.quarantine import QuarantineManager
+    from malguard.scanner import Scanner
 
 # Global JSON mode flag
 JSON_MODE = False
 
+
+class _MessageFormatter(logging.Formatter):
+    """Show library errors and warnings in the CLI's own message style."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.levelno >= logging.ERROR:
+            return red(f"❌ {message}")
+        if record.levelno >= logging.WARNING:
+            return yellow(f"⚠️  {message}")
+        return message
+
+
+def setup_logging():
+    """Send malguard's log messages to stderr, keeping stdout for output."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_MessageFormatter())
+    root = logging.getLogger('malguard')
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING)
+
+
+def print_json(data):
+    """Print JSON: indented on a terminal, compact when piped to another program."""
+    print(dumps_json(data, indent=sys.stdout.isatty()).decode('utf-8'))
+
+
 def output(data, message: str = None):
     """Output data in JSON or human-readable format."""
     if JSON_MODE:
-        print(json.dumps(data, indent=2, default=str))
+        print_json(data)
     elif message:
         print(message)
 
@@ -57,7 +94,7 @@ def cmd_scan(args, scanner: Scanner) -> int:
         
         if not result:
             if JSON_MODE:
-                print(json.dumps({"error": "Could not scan file"}))
+                print_json({"error": "Could not scan file"})
             else:
                 print(red("❌ Could not scan file"))
             return 1
@@ -74,19 +111,25 @@ def cmd_scan(args, scanner: Scanner) -> int:
         }
         
         if JSON_MODE:
-            print(json.dumps(result_dict, indent=2))
-            return 2 if result.detected else 0
+            print_json(result_dict)
+            if result.detected:
+                return 2
+            return 0 if result.reason in ("clean", "skipped") else 1
         
         if result.reason == "skipped":
             print(yellow(f"⏩ Skipped (non-executable): {result.file_name}"))
             print("   Use --all to scan all file types")
             return 0
         
+        if not result.detected and result.reason != "clean":
+            print(yellow(f"⚠️  Not fully scanned ({result.reason}): {result.file_name}"))
+            return 1
+        
         if result.detected:
             print(red("🚨 MALWARE DETECTED!"))
             print(f"   File:     {result.file_name}")
             print(f"   Malware:  {red(result.malware_name)}")
-            print(f"   Severity: {Colors.severity(result.severity)}{result.severity}{Colors.RESET}")
+            print(f"   Severity: {Colors.severity_label(result.severity)}")
             print(f"   Reason:   {result.reason}")
             print(f"   SHA-256:  {dim(result.hash)}")
             return 2  # Special exit code for detection
@@ -97,27 +140,41 @@ def cmd_scan(args, scanner: Scanner) -> int:
             return 0
     
     elif path.is_dir():
+        from malguard.scanner import ScanSummaryAccumulator
+        
         # Directory scan
         print(f"\n🔍 Scanning directory: {path}")
         if skip_non_suspicious:
             print("   (Scanning executables only. Use --all for all files)")
         print("-" * 50)
         
+        last_update = time.monotonic()
+        
         def progress(current, total, file_path):
-            # Simple progress indicator
-            if current % 10 == 0 or current == total:
-                print(f"   Progress: {current}/{total} files", end='\r')
+            # Simple progress indicator, redrawn at most every 100 ms
+            nonlocal last_update
+            now = time.monotonic()
+            if now - last_update > 0.1 or current == total:
+                last_update = now
+                sys.stdout.write(f"   Progress: {current}/{total} files\r")
+                sys.stdout.flush()
         
-        results = scanner.scan_directory(
+        # Results are counted as they stream in; only detections are kept
+        accumulator = ScanSummaryAccumulator()
+        threats = []
+        for result in scanner.scan_directory_iter(
             path, 
             skip_non_suspicious=skip_non_suspicious,
             progress_callback=progress
-        )
+        ):
+            accumulator.add(result)
+            if result.detected:
+                threats.append(result)
         
         print()  # New line after progress
         
         # Summary
-        summary = scanner.get_scan_summary(results)
+        summary = accumulator.finalize()
         print("\n" + "=" * 50)
         print("📊 SCAN SUMMARY")
         print("=" * 50)
@@ -125,15 +182,16 @@ def cmd_scan(args, scanner: Scanner) -> int:
         print(f"   Clean:        {summary['clean']}")
         print(f"   Detected:     {summary['detected']}")
         print(f"   Skipped:      {summary['skipped']}")
+        if summary['errors'] > 0:
+            print(f"   Errors:       {summary['errors']}")
         if summary.get('from_archives', 0) > 0:
             print(f"   From archives: {summary['from_archives']}")
         print(f"   Total size:   {summary['total_size']}")
         
         if summary['detected'] > 0:
             print("\n🚨 THREATS FOUND:")
-            for result in results:
-                if result.detected:
-                    print(f"   • {result.file_name}: {result.malware_name}")
+            for result in threats:
+                print(f"   • {result.file_name}: {result.malware_name}")
             return 2
         
         return 0
@@ -145,6 +203,8 @@ def cmd_scan(args, scanner: Scanner) -> int:
 
 def cmd_add(args, database: SignatureDatabase) -> int:
     """Handle add signature command."""
+    from malguard.hasher import FileHasher
+    
     file_path = Path(args.file_path).resolve()
     
     if not file_path.is_file():
@@ -160,7 +220,8 @@ def cmd_add(args, database: SignatureDatabase) -> int:
     # Add to database
     severity = args.severity if hasattr(args, 'severity') else "medium"
     
-    if database.add(file_hash, args.malware_name, severity=severity, source="cli"):
+    if database.add(file_hash, args.malware_name, severity=severity, source="cli",
+                    size=file_path.stat().st_size):
         print(f"\n   File:    {file_path.name}")
         print(f"   SHA-256: {file_hash}")
         return 0
@@ -241,8 +302,6 @@ def cmd_stats(logger: ScanLogger) -> int:
 
 def cmd_export(args, database: SignatureDatabase) -> int:
     """Export signatures to JSON file."""
-    import json
-    
     output_path = Path(args.output).resolve()
     signatures = database.list_all()
     
@@ -260,8 +319,8 @@ def cmd_export(args, database: SignatureDatabase) -> int:
     }
     
     try:
-        with open(output_path, 'w') as f:
-            json.dump(export_data, f, indent=2, default=str)
+        with open(output_path, 'wb') as f:
+            f.write(dumps_json(export_data, indent=True))
         print(f"✅ Exported {len(signatures)} signatures to: {output_path}")
         return 0
     except Exception as e:
@@ -271,8 +330,6 @@ def cmd_export(args, database: SignatureDatabase) -> int:
 
 def cmd_import(args, database: SignatureDatabase) -> int:
     """Import signatures from JSON file."""
-    import json
-    
     input_path = Path(args.input).resolve()
     
     if not input_path.exists():
@@ -280,8 +337,8 @@ def cmd_import(args, database: SignatureDatabase) -> int:
         return 1
     
     try:
-        with open(input_path, 'r') as f:
-            data = json.load(f)
+        with open(input_path, 'rb') as f:
+            data = loads_json(f.read())
         
         signatures = data.get('signatures', data)
         if isinstance(signatures, dict):
@@ -293,18 +350,20 @@ def cmd_import(args, database: SignatureDatabase) -> int:
         added = 0
         skipped = 0
         
-        for hash_key, sig_data in items:
-            if isinstance(sig_data, dict):
-                name = sig_data.get('name', 'Unknown')
-                severity = sig_data.get('severity', 'medium')
-                source = sig_data.get('source', 'import')
-            else:
-                continue
-            
-            if database.add(hash_key, name, severity=severity, source=source):
-                added += 1
-            else:
-                skipped += 1
+        with database.batch():
+            for hash_key, sig_data in items:
+                if isinstance(sig_data, dict):
+                    name = sig_data.get('name', 'Unknown')
+                    severity = sig_data.get('severity', 'medium')
+                    source = sig_data.get('source', 'import')
+                    size = sig_data.get('size') if isinstance(sig_data.get('size'), int) else None
+                else:
+                    continue
+                
+                if database.add(hash_key, name, severity=severity, source=source, size=size):
+                    added += 1
+                else:
+                    skipped += 1
         
         print(f"✅ Import complete: {added} added, {skipped} skipped (duplicates)")
         return 0
@@ -317,55 +376,38 @@ def cmd_import(args, database: SignatureDatabase) -> int:
         return 1
 
 
-def main() -> int:
-    """Main entry point."""
-    parser = argparse.ArgumentParser(
-        prog="malguard",
-        description="MalGuard - Signature-Based Malware Detection System",
-        epilog=f"Config directory: {get_config_dir()}"
-    )
-    
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
-    
-    # Scan command
-    scan_parser = subparsers.add_parser('scan', help='Scan file or directory for malware')
-    scan_parser.add_argument('path', help='Path to file or directory to scan')
-    scan_parser.add_argument('--all', '-a', dest='all_files', action='store_true',
-                            help='Scan all files (not just executables)')
-    scan_parser.add_argument('--json', '-j', dest='json_output', action='store_true',
-                            help='Output results as JSON')
-    
-    # Add signature command
-    add_parser = subparsers.add_parser('add', help='Add malware signature to database')
-    add_parser.add_argument('file_path', help='Path to malware sample file')
-    add_parser.add_argument('malware_name', help='Malware name (e.g., "Trojan.Generic")')
-    add_parser.add_argument('--severity', '-s', choices=['low', 'medium', 'high', 'critical'],
-                           default='medium', help='Threat severity level')
-    
-    # Remove signature command
-    remove_parser = subparsers.add_parser('remove', help='Remove signature from database')
-    remove_parser.add_argument('hash', help='SHA-256 hash to remove')
-    
-    # List signatures command
-    subparsers.add_parser('list', help='List all malware signatures')
-    
-    # History command
-    subparsers.add_parser('history', help='Show recent detection history')
-    
-    # Stats command
-    subparsers.add_parser('stats', help='Show scanning statistics')
-    
-    # Export command
-    export_parser = subparsers.add_parser('export', help='Export signatures to JSON file')
-    export_parser.add_argument('output', help='Output file path (e.g., signatures.json)')
-    
-    # Import command
-    import_parser = subparsers.add_parser('import', help='Import signatures from JSON file')
-    import_parser.add_argument('input', help='Input JSON file path')
-    
-    # Quarantine command
-    quarantine_parser = subparsers.add_parser('quarantine', help='Manage quarantined files')
-    quarantine_subparsers = quarantine_parser.add_subparsers(dest='quarantine_action', help='Quarantine actions')
+def _scan_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('path', help='Path to file or directory to scan')
+    parser.add_argument('--all', '-a', dest='all_files', action='store_true',
+                        help='Scan all files (not just executables)')
+    parser.add_argument('--json', '-j', dest='json_output', action='store_true',
+                        help='Output results as JSON')
+    parser.add_argument('--fast-yara', dest='fast_yara', action='store_true',
+                        help='Match YARA rules in fast mode (rules counting string '
+                             'matches may miss)')
+
+
+def _add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('file_path', help='Path to malware sample file')
+    parser.add_argument('malware_name', help='Malware name (e.g., "Trojan.Generic")')
+    parser.add_argument('--severity', '-s', choices=['low', 'medium', 'high', 'critical'],
+                        default='medium', help='Threat severity level')
+
+
+def _remove_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('hash', help='SHA-256 hash to remove')
+
+
+def _export_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('output', help='Output file path (e.g., signatures.json)')
+
+
+def _import_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('input', help='Input JSON file path')
+
+
+def _quarantine_arguments(parser: argparse.ArgumentParser):
+    quarantine_subparsers = parser.add_subparsers(dest='quarantine_action', help='Quarantine actions')
     
     quarantine_subparsers.add_parser('list', help='List quarantined files')
     
@@ -377,39 +419,104 @@ def main() -> int:
     qdelete_parser.add_argument('hash', help='Hash of file to delete')
     
     quarantine_subparsers.add_parser('clear', help='Delete all quarantined files')
+
+
+# Command name -> (help, argument builder)
+COMMANDS = {
+    'scan': ('Scan file or directory for malware', _scan_arguments),
+    'add': ('Add malware signature to database', _add_arguments),
+    'remove': ('Remove signature from database', _remove_arguments),
+    'list': ('List all malware signatures', None),
+    'history': ('Show recent detection history', None),
+    'stats': ('Show scanning statistics', None),
+    'export': ('Export signatures to JSON file', _export_arguments),
+    'import': ('Import signatures from JSON file', _import_arguments),
+    'quarantine': ('Manage quarantined files', _quarantine_arguments),
+}
+
+
+def build_parser(argv) -> argparse.ArgumentParser:
+    """
+    Build the argument parser.
+    
+    Only the subparser for the command in argv is built. With no command,
+    an unknown one, or top-level options (-h) all of them are, so help and
+    error messages still list every command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="malguard",
+        description="MalGuard - Signature-Based Malware Detection System",
+        epilog=f"Config directory: {get_config_dir()}"
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    command = argv[0] if argv else None
+    names = [command] if command in COMMANDS else list(COMMANDS)
+    
+    for name in names:
+        help_text, add_arguments = COMMANDS[name]
+        command_parser = subparsers.add_parser(name, help=help_text)
+        if add_arguments:
+            add_arguments(command_parser)
+    
+    return parser
+
+
+def main() -> int:
+    """Main entry point."""
+    argv = sys.argv[1:]
+    parser = build_parser(argv)
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    setup_logging()
     
     if not args.command:
         parser.print_help()
         return 0
     
-    # Initialize components
+    # Initialize only the components the command needs
+    if args.command == 'scan':
+        from malguard.database import SignatureDatabase
+        from malguard.logger import ScanLogger
+        from malguard.quarantine import QuarantineManager
+        from malguard.scanner import Scanner
+        from malguard.yara_engine import YaraEngine
+        
+        scanner = Scanner(database=SignatureDatabase(), logger=ScanLogger(),
+                          yara_engine=YaraEngine(fast_mode=args.fast_yara),
+                          quarantine=QuarantineManager(), auto_quarantine=True)
+        return cmd_scan(args, scanner)
+    
+    if args.command in ('history', 'stats'):
+        from malguard.logger import ScanLogger
+        
+        logger = ScanLogger()
+        if args.command == 'history':
+            return cmd_history(logger)
+        return cmd_stats(logger)
+    
+    if args.command == 'quarantine':
+        from malguard.quarantine import QuarantineManager
+        
+        return cmd_quarantine(args, QuarantineManager())
+    
+    from malguard.database import SignatureDatabase
+    
     database = SignatureDatabase()
-    logger = ScanLogger()
-    quarantine = QuarantineManager()
-    scanner = Scanner(database=database, logger=logger, quarantine=quarantine, auto_quarantine=True)
     
     # Execute command
-    if args.command == 'scan':
-        return cmd_scan(args, scanner)
-    elif args.command == 'add':
+    if args.command == 'add':
         return cmd_add(args, database)
     elif args.command == 'remove':
         return cmd_remove(args, database)
     elif args.command == 'list':
         return cmd_list(database)
-    elif args.command == 'history':
-        return cmd_history(logger)
-    elif args.command == 'stats':
-        return cmd_stats(logger)
     elif args.command == 'export':
         return cmd_export(args, database)
     elif args.command == 'import':
         return cmd_import(args, database)
-    elif args.command == 'quarantine':
-        return cmd_quarantine(args, quarantine)
     
     return 0
 
@@ -427,11 +534,10 @@ def cmd_quarantine(args, quarantine: QuarantineManager) -> int:
         print(f"\n🔒 Quarantined Files ({len(files)})")
         print("=" * 60)
         for f in files:
-            sev_color = Colors.severity(f.get('severity', 'medium'))
             print(f"\n   {red(f['malware_name'])}")
             print(f"   Hash:     {dim(f['hash'][:32])}...")
             print(f"   Original: {f['original_name']}")
-            print(f"   Severity: {sev_color}{f['severity']}{Colors.RESET}")
+            print(f"   Severity: {Colors.severity_label(f['severity'])}")
             print(f"   Date:     {f['quarantined_on'][:10]}")
         print()
         return 0
@@ -3,10 +3,22 @@ MalGuard - Signature-Based Malware Detection System
 Desktop CLI Package
 """
 
-from .scanner import Scanner
-from .database import SignatureDatabase
-from .hasher import FileHasher
-from .logger import ScanLogger
+import importlib
 
 __version__ = "1.0.0"
 __all__ = ["Scanner", "SignatureDatabase", "FileHasher", "ScanLogger"]
+
+# Exports are imported on first access, so importing a light submodule
+# (e.g. malguard.utils) doesn't pull in the scanner and YARA
+_EXPORTS = {
+    "Scanner": ".scanner",
+    "SignatureDatabase": ".database",
+    "FileHasher": ".hasher",
+    "ScanLogger": ".logger",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
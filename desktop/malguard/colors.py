@@ -15,6 +15,14 @@ except ImportError:
     class Style:
         BRIGHT = DIM = RESET_ALL = ""
 
+# Resolved once at import; the shorthand functions below use these directly
+GREEN_PREFIX = Fore.GREEN
+RED_PREFIX = Fore.RED
+YELLOW_PREFIX = Fore.YELLOW
+CYAN_PREFIX = Fore.CYAN
+DIM_PREFIX = Style.DIM
+RESET = Style.RESET_ALL
+
 
 class Colors:
     """Color codes for terminal output."""
@@ -38,13 +46,15 @@ class Colors:
     @classmethod
     def severity(cls, level: str) -> str:
         """Get color for severity level."""
-        colors = {
-            'critical': cls.CRITICAL,
-            'high': cls.HIGH,
-            'medium': cls.MEDIUM,
-            'low': cls.LOW
-        }
-        return colors.get(level.lower(), "")
+        return _SEVERITY_COLORS.get(level.lower(), "")
+    
+    @classmethod
+    def severity_label(cls, level: str) -> str:
+        """Get severity level text wrapped in its color."""
+        label = _SEVERITY_LABELS.get(level)
+        if label is None:
+            label = f"{cls.severity(level)}{level}{cls.RESET}"
+        return label
     
     @classmethod
     def success(cls, text: str) -> str:
@@ -67,18 +77,31 @@ class Colors:
         return f"{cls.MUTED}{text}{cls.RESET}"
 
 
+# Built once instead of per call; both are looked up for every detection
+_SEVERITY_COLORS = {
+    'critical': Colors.CRITICAL,
+    'high': Colors.HIGH,
+    'medium': Colors.MEDIUM,
+    'low': Colors.LOW
+}
+_SEVERITY_LABELS = {
+    level: f"{color}{level}{Colors.RESET}"
+    for level, color in _SEVERITY_COLORS.items()
+}
+
+
 # Shorthand functions
 def green(text: str) -> str:
-    return Colors.success(text)
+    return f"{GREEN_PREFIX}{text}{RESET}"
 
 def red(text: str) -> str:
-    return Colors.danger(text)
+    return f"{RED_PREFIX}{text}{RESET}"
 
 def yellow(text: str) -> str:
-    return Colors.warning(text)
+    return f"{YELLOW_PREFIX}{text}{RESET}"
 
 def cyan(text: str) -> str:
-    return Colors.info(text)
+    return f"{CYAN_PREFIX}{text}{RESET}"
 
 def dim(text: str) -> str:
-    return Colors.muted(text)
+    return f"{DIM_PREFIX}{text}{RESET}"
@@ -4,24 +4,49 @@ Stores and manages malware hash signatures with HMAC integrity verification.
 """
 
 import os
+import sys
 import json
 import hmac
 import hashlib
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, Optional, Any, Set, Tuple
 
-from .utils import get_config_dir
+from .utils import get_config_dir, dumps_json, loads_json
 
 
 class SignatureDatabase:
     """
     Manages malware signature database with tamper protection.
     
-    Signatures are stored as: {hash: {name, severity, added_on, source}}
-    Database file is HMAC-signed to detect tampering.
+    Signatures are stored as: {hash: {name, severity, added_on, source[, size]}}
+    Database file is signed to detect tampering: the first line is
+    "<version>:<hex signature>", the rest is the canonical JSON it was
+    computed over, so loading verifies the raw bytes without re-serializing
+    them. Version 3 is keyed BLAKE2b personalized for this format. Versions
+    2 (plain keyed BLAKE2b) and 1 (HMAC-SHA256, a bare hex first line or
+    the older single-JSON layout) are still accepted and rewritten as
+    version 3 on load.
+    
+    Single adds and removes don't rewrite that file. They are appended to a
+    log next to it (signatures.log), one signed JSON record per line, and
+    the log is folded back into the main file once it outgrows it. Each
+    record's signature covers the previous one and its position, starting
+    from the main file's, so records can't be dropped, reordered or
+    replayed. A signed head file (signatures.head) holds the record count
+    and last signature, so the log can't be cut short either.
     """
     
+    SIGNATURE_VERSION = 3
+    
+    # BLAKE2b personalization for version 3 signatures, so a version 3
+    # file can't be passed off as version 2 (which needs no head file)
+    _PERSON = b'malguard-db-v3'
+    
+    # Compact once the log is larger than this and twice the main file
+    COMPACT_MIN_LOG_SIZE = 64 << 10
+    
     def __init__(self, db_path: Optional[Path] = None):
         """
         Initialize signature database.
@@ -33,70 +58,329 @@ class SignatureDatabase:
             self.db_file = Path(db_path)
         else:
             self.db_file = get_config_dir() / "signatures.json"
+        self.log_file = self.db_file.with_suffix(".log")
+        self.head_file = self.db_file.with_suffix(".head")
+        # Written by a compaction before its new main file is put in place
+        self._pending_head_file = self.head_file.with_name(self.head_file.name + ".new")
+        # The folded log, moved aside until the new head is in place
+        self._old_log_file = self.log_file.with_name(self.log_file.name + ".old")
         
         # Secret key for HMAC signing (in production, use env var or secure storage)
         self._secret_key = os.environ.get(
             "MALGUARD_DB_KEY", 
             "malguard_signature_db_secret_key_2024"
         ).encode('utf-8')
+        # HMAC hashes keys longer than the SHA-256 block size before use;
+        # do it once here instead of on every signature computation.
+        # The resulting HMAC is identical, and the key then also fits
+        # BLAKE2b's 64-byte key limit.
+        if len(self._secret_key) > hashlib.sha256().block_size:
+            self._secret_key = hashlib.sha256(self._secret_key).digest()
         
         self.signatures: Dict[str, Dict[str, Any]] = {}
+        # Known hashes, for a cheap "definitely clean" check. Most lookups miss.
+        self._hash_set: Set[str] = set()
+        # File sizes of signatures that recorded one. A file with any other
+        # size can't match, unless some signature has no size on record.
+        self._size_set: Set[int] = set()
+        self._unsized = 0
+        
+        # Signature of the main file; the log's record chain starts from
+        # it, so records can't be replayed onto a different database.
+        self._base_signature = b""
+        self._base_size = 0
+        self._log_size = 0
+        # Records in the log and the signature of the last one (the main
+        # file's when the log is empty)
+        self._log_count = 0
+        self._last_signature = b""
+        # Open log file while inside batch()
+        self._log_handle = None
+        # False if the files on disk failed to load or verify. Changes are
+        # then refused rather than written over them, so nothing is lost
+        # until the files are restored or removed.
+        self._intact = False
         self._load()
     
-    def _compute_signature(self, data: str) -> str:
-        """Compute HMAC-SHA256 signature of data."""
-        return hmac.new(self._secret_key, data.encode('utf-8'), hashlib.sha256).hexdigest()
+    def _compute_signature(self, data: bytes, version: int = SIGNATURE_VERSION) -> str:
+        """Compute the signature of data (keyed BLAKE2b, or HMAC-SHA256 for version 1)."""
+        if version == 1:
+            return hmac.digest(self._secret_key, data, 'sha256').hex()
+        if version == 2:
+            return hashlib.blake2b(data, key=self._secret_key, digest_size=32).hexdigest()
+        return hashlib.blake2b(data, key=self._secret_key, digest_size=32,
+                               person=self._PERSON).hexdigest()
     
-    def _load(self) -> None:
-        """Load signatures from file with integrity check."""
-        if not self.db_file.exists():
-            self.signatures = {}
-            return
+    def _read_signed_data(self, raw: bytes) -> Optional[Tuple[bytes, int]]:
+        """
+        Verify a database file and return the signed JSON bytes.
         
-        try:
-            with open(self.db_file, 'r', encoding='utf-8') as f:
-                raw_data = json.load(f)
-            
-            # Verify structure
+        Returns:
+            Tuple of (canonical JSON bytes, signature version), or None if
+            the file is invalid or tampered
+        """
+        version = 1
+        
+        if raw.lstrip().startswith(b'{'):
+            # Oldest format: {"signature": ..., "data": {...}} in one JSON document
+            raw_data = json.loads(raw)
             if 'signature' not in raw_data or 'data' not in raw_data:
                 print("❌ Invalid signature database format")
-                self.signatures = {}
-                return
+                return None
+            stored_sig = str(raw_data['signature']).encode('utf-8')
+            data = json.dumps(raw_data['data'], sort_keys=True, separators=(',', ':')).encode('utf-8')
+        else:
+            stored_sig, sep, data = raw.partition(b'\n')
+            if not sep:
+                print("❌ Invalid signature database format")
+                return None
+            stored_sig = stored_sig.strip()
+            prefix, colon, rest = stored_sig.partition(b':')
+            if colon:
+                if not prefix.isdigit():
+                    print("❌ Invalid signature database format")
+                    return None
+                version, stored_sig = int(prefix), rest
+        
+        # Verify signature
+        expected = self._compute_signature(data, version).encode('ascii')
+        if not hmac.compare_digest(stored_sig, expected):
+            print("⚠️  WARNING: Signature database has been tampered with!")
+            return None
+        
+        return data, version
+    
+    def _load(self) -> None:
+        """Load signatures from file and append log with integrity check."""
+        self.signatures = {}
+        version = self.SIGNATURE_VERSION
+        
+        try:
+            if self.db_file.exists():
+                with open(self.db_file, 'rb') as f:
+                    raw = f.read()
+                signed = self._read_signed_data(raw)
+                
+                if signed is None:
+                    return
+                data, version = signed
+                
+                # Interned keys: the hash set and dict share one string object
+                # per hash, and equal-key checks on lookup hits are identity checks
+                signatures = {sys.intern(k): v for k, v in loads_json(data).items()}
+                self._base_signature = raw.partition(b'\n')[0].strip()
+                self._base_size = len(raw)
+                self._recover_compaction()
+            else:
+                signatures = {}
             
-            # Verify HMAC
-            stored_sig = raw_data['signature']
-            data_str = json.dumps(raw_data['data'], sort_keys=True, separators=(',', ':'))
-            computed_sig = self._compute_signature(data_str)
+            # A version 3 main file always has a head file. Older ones have
+            # none until they're re-signed below.
+            if (version == self.SIGNATURE_VERSION and self.db_file.exists()) \
+                    or self.log_file.exists() or self.head_file.exists():
+                if not self._replay_log(signatures):
+                    print("⚠️  WARNING: Signature database has been tampered with!")
+                    return
+            else:
+                self._log_count = 0
+                self._last_signature = self._base_signature
             
-            if not hmac.compare_digest(stored_sig, computed_sig):
-                print("⚠️  WARNING: Signature database has been tampered with!")
-                self.signatures = {}
-                return
+            self.signatures = signatures
+            self._intact = True
+            self._hash_set = set(self.signatures)
+            for info in self.signatures.values():
+                self._track_size(info)
             
-            self.signatures = raw_data['data']
+            # Re-sign databases written with an older signature scheme
+            if version != self.SIGNATURE_VERSION:
+                self._save()
             
-        except (json.JSONDecodeError, OSError) as e:
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
             print(f"❌ Error loading signature database: {e}")
             self.signatures = {}
     
+    def _sign_record(self, previous: bytes, seq: int, data: bytes) -> bytes:
+        """Signature of log record number seq, chained to the one before it."""
+        return self._compute_signature(
+            previous + b'\n' + str(seq).encode('ascii') + b'\n' + data
+        ).encode('ascii')
+    
+    def _sign_head(self, count: int, last_signature: bytes,
+                   base_signature: Optional[bytes] = None) -> bytes:
+        """
+        Signature of a head file's record count and last signature, bound
+        to the main file (the current one unless base_signature is given).
+        """
+        if base_signature is None:
+            base_signature = self._base_signature
+        return self._compute_signature(
+            b'head\n' + base_signature + b'\n'
+            + str(count).encode('ascii') + b':' + last_signature
+        ).encode('ascii')
+    
+    def _read_head(self, head_file: Optional[Path] = None) -> Optional[Tuple[int, bytes]]:
+        """
+        Read and verify the head file (or a pending one).
+        
+        Returns:
+            Tuple of (record count, last record signature), or None if the
+            file is missing or doesn't verify
+        """
+        try:
+            with open(head_file or self.head_file, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        
+        # The last signature is the main file's header ("3:<hex>") while
+        # the log is empty, so the head's own signature is split off the end
+        count, _, rest = raw.strip().partition(b':')
+        last_signature, _, stored_sig = rest.rpartition(b':')
+        if not count.isdigit():
+            return None
+        if not hmac.compare_digest(stored_sig, self._sign_head(int(count), last_signature)):
+            return None
+        return int(count), last_signature
+    
+    def _write_head(self) -> None:
+        """Record the log's current length and last signature in the head file."""
+        self._write_head_file(self.head_file, self._log_count, self._last_signature)
+    
+    def _write_head_file(self, head_file: Path, count: int, last_signature: bytes,
+                         base_signature: Optional[bytes] = None,
+                         sync: bool = False) -> None:
+        """Write a signed head file, replacing it in one step."""
+        body = str(count).encode('ascii') + b':' + last_signature
+        sig = self._sign_head(count, last_signature, base_signature)
+        tmp = head_file.with_name(head_file.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            f.write(body + b':' + sig)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, head_file)
+    
+    def _finish_compaction(self) -> None:
+        """
+        Retire the log folded into the main file and put the pending head
+        in its place. The log is only deleted once the new head is in.
+        """
+        if self.log_file.exists():
+            os.replace(self.log_file, self._old_log_file)
+        os.replace(self._pending_head_file, self.head_file)
+        if self._old_log_file.exists():
+            self._old_log_file.unlink()
+    
+    def _recover_compaction(self) -> None:
+        """Complete a compaction interrupted after its main file was replaced."""
+        if self._pending_head_file.exists():
+            if self._read_head(self._pending_head_file) == (0, self._base_signature):
+                # The main file on disk is the compacted one, so the log
+                # is already part of it
+                self._finish_compaction()
+            else:
+                # Interrupted before the main file was replaced; the old
+                # main file, head and log are still current
+                self._pending_head_file.unlink()
+        if self._old_log_file.exists():
+            self._old_log_file.unlink()
+    
+    def _replay_log(self, signatures: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Apply the append log's records to signatures.
+        
+        Returns:
+            False if the head file or a record's signature doesn't verify,
+            or the log is shorter than the head file says
+        """
+        head = self._read_head()
+        if head is None:
+            return False
+        head_count, head_signature = head
+        
+        try:
+            with open(self.log_file, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b''
+        self._log_size = len(raw)
+        
+        previous = self._base_signature
+        count = 0
+        # The head file is written after the records it covers; an empty
+        # log must end where the main file does
+        head_matched = head_count == 0 and hmac.compare_digest(head_signature, previous)
+        
+        lines = raw.split(b'\n')
+        # The last element is empty, or a record cut short by an
+        # interrupted write; skip it either way
+        for line in lines[:-1]:
+            stored_sig, sep, data = line.partition(b':')
+            if not sep or not hmac.compare_digest(
+                    stored_sig, self._sign_record(previous, count, data)):
+                return False
+            
+            record = loads_json(data)
+            file_hash = sys.intern(record['hash'])
+            if record['info'] is None:
+                signatures.pop(file_hash, None)
+            else:
+                signatures[file_hash] = record['info']
+            
+            previous = stored_sig
+            count += 1
+            if count == head_count:
+                head_matched = hmac.compare_digest(head_signature, previous)
+        
+        # Records past the head's count were appended by a write that
+        # didn't get to update it; they're chained, so they're kept
+        if not head_matched:
+            return False
+        
+        self._log_count = count
+        self._last_signature = previous
+        return True
+    
     def _save(self) -> bool:
-        """Save signatures to file with HMAC signature."""
+        """Save all signatures to file with signature, emptying the append log."""
+        if not self._intact:
+            print(f"❌ Signature database failed verification, not overwriting it. "
+                  f"Restore or remove {self.db_file} (and its .log and .head "
+                  f"files) to make changes.")
+            return False
+        
         try:
             # Create parent directory if needed
             self.db_file.parent.mkdir(parents=True, exist_ok=True)
             
-            # Compute signature
-            data_str = json.dumps(self.signatures, sort_keys=True, separators=(',', ':'))
-            signature = self._compute_signature(data_str)
+            # Sign the exact bytes that are written
+            data = dumps_json(self.signatures, sort_keys=True)
+            signature = self._compute_signature(data)
+            header = f"{self.SIGNATURE_VERSION}:{signature}".encode('ascii')
             
-            # Save signed database
-            signed_db = {
-                'signature': signature,
-                'data': self.signatures
-            }
+            # Save signed database to a temp file and rename it over the
+            # old one, so a crash mid-write leaves the previous version
+            tmp = self.db_file.with_suffix(self.db_file.suffix + ".tmp")
+            with open(tmp, 'wb') as f:
+                f.write(header + b'\n' + data)
+                f.flush()
+                os.fsync(f.fileno())
             
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(signed_db, f, indent=2)
+            # The new file's (empty-log) head is written first, so from the
+            # moment it's in place a head that verifies against it exists;
+            # _load finishes a compaction interrupted after this point
+            self._write_head_file(self._pending_head_file, 0, header,
+                                  base_signature=header, sync=True)
+            os.replace(tmp, self.db_file)
+            
+            self._base_signature = header
+            self._base_size = len(header) + 1 + len(data)
+            self._log_size = 0
+            self._log_count = 0
+            self._last_signature = header
+            
+            # Everything in the log is now part of the main file
+            self._finish_compaction()
             
             return True
             
@@ -104,8 +388,102 @@ class SignatureDatabase:
             print(f"❌ Error saving signature database: {e}")
             return False
     
+    def _append(self, file_hash: str, info: Optional[Dict[str, Any]]) -> bool:
+        """
+        Record one added (info) or removed (None) signature in the append log.
+        
+        Returns:
+            True if written successfully
+        """
+        # The record chain starts from a signed main file
+        if not self._intact or not self._base_signature:
+            return self._save()
+        
+        data = dumps_json({'hash': file_hash, 'info': info})
+        signature = self._sign_record(self._last_signature, self._log_count, data)
+        line = signature + b':' + data + b'\n'
+        
+        try:
+            if self._log_handle is not None:
+                self._log_handle.write(line)
+            else:
+                with open(self.log_file, 'ab') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"❌ Error saving signature database: {e}")
+            return False
+        
+        self._log_size += len(line)
+        self._log_count += 1
+        self._last_signature = signature
+        
+        if self._log_handle is None:
+            try:
+                self._write_head()
+            except OSError as e:
+                print(f"❌ Error saving signature database: {e}")
+                return False
+            self._maybe_compact()
+        return True
+    
+    def _maybe_compact(self) -> None:
+        """Fold the append log into the main file once it has grown large."""
+        if self._log_size > max(2 * self._base_size, self.COMPACT_MIN_LOG_SIZE):
+            self.compact()
+    
+    def compact(self) -> bool:
+        """
+        Rewrite the main database file with every logged change applied.
+        
+        Returns:
+            True if saved successfully
+        """
+        return self._save()
+    
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Keep the append log open across several add/remove calls.
+        
+        Compaction, if due, runs once when the batch ends.
+        """
+        if self._log_handle is not None:
+            yield
+            return
+        
+        # Changes to a database that failed verification are refused
+        # (by _append) rather than logged
+        if not self._intact:
+            yield
+            return
+        
+        # The record chain starts from a signed main file
+        if not self._base_signature:
+            self._save()
+        
+        with open(self.log_file, 'ab') as f:
+            self._log_handle = f
+            try:
+                yield
+            finally:
+                self._log_handle = None
+        # One head update for the whole batch
+        try:
+            self._write_head()
+        except OSError as e:
+            print(f"❌ Error saving signature database: {e}")
+        self._maybe_compact()
+    
+    def _track_size(self, info: Dict[str, Any]) -> None:
+        """Record a signature's file size for size_possible."""
+        size = info.get('size')
+        if isinstance(size, int):
+            self._size_set.add(size)
+        else:
+            self._unsized += 1
+    
     def add(self, file_hash: str, name: str, severity: str = "medium", 
-            source: str = "user") -> bool:
+            source: str = "user", size: Optional[int] = None) -> bool:
         """
         Add a new signature to the database.
         
@@ -114,24 +492,29 @@ class SignatureDatabase:
             name: Malware name/identifier (e.g., "Trojan.GenericKD")
             severity: Threat level (low, medium, high, critical)
             source: Where this signature came from
+            size: Size of the malware file in bytes, if known
             
         Returns:
             True if added successfully, False if already exists or error
         """
-        file_hash = file_hash.lower()
+        file_hash = sys.intern(file_hash.lower())
         
         if file_hash in self.signatures:
             print(f"ℹ️  Signature already exists: {name}")
             return False
         
+        self._hash_set.add(file_hash)
         self.signatures[file_hash] = {
             'name': name,
             'severity': severity,
             'added_on': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'source': source
         }
+        if size is not None:
+            self.signatures[file_hash]['size'] = size
+        self._track_size(self.signatures[file_hash])
         
-        if self._save():
+        if self._append(file_hash, self.signatures[file_hash]):
             print(f"✅ Added signature: {name} ({file_hash[:16]}...)")
             return True
         return False
@@ -153,9 +536,14 @@ class SignatureDatabase:
             return False
         
         name = self.signatures[file_hash]['name']
+        if not isinstance(self.signatures[file_hash].get('size'), int):
+            self._unsized -= 1
+        # Sizes are shared between signatures, so a removed size stays in
+        # the set; that only costs an unneeded hash.
         del self.signatures[file_hash]
+        self._hash_set.discard(file_hash)
         
-        if self._save():
+        if self._append(file_hash, None):
             print(f"✅ Removed signature: {name}")
             return True
         return False
@@ -170,7 +558,23 @@ class SignatureDatabase:
         Returns:
             Signature info dict if found, None otherwise
         """
-        return self.signatures.get(file_hash.lower())
+        if not file_hash.islower():
+            file_hash = file_hash.lower()
+        if file_hash not in self._hash_set:
+            return None
+        return self.signatures[file_hash]
+    
+    def size_possible(self, size: int) -> bool:
+        """
+        Check whether a file of this size could match a signature.
+        
+        Args:
+            size: File size in bytes
+            
+        Returns:
+            False if no signature can match, so hashing can be skipped
+        """
+        return self._unsized > 0 or size in self._size_set
     
     def list_all(self) -> Dict[str, Dict[str, Any]]:
         """Get all signatures."""
@@ -193,18 +597,23 @@ class SignatureDatabase:
             Number of signatures imported
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                data = loads_json(f.read())
             
             count = 0
             for file_hash, info in data.items():
-                if file_hash.lower() not in self.signatures:
-                    self.signatures[file_hash.lower()] = {
+                file_hash = sys.intern(file_hash.lower())
+                if file_hash not in self.signatures:
+                    self._hash_set.add(file_hash)
+                    self.signatures[file_hash] = {
                         'name': info.get('name', 'Unknown'),
                         'severity': info.get('severity', 'medium'),
                         'added_on': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         'source': info.get('source', 'import')
                     }
+                    if isinstance(info.get('size'), int):
+                        self.signatures[file_hash]['size'] = info['size']
+                    self._track_size(self.signatures[file_hash])
                     count += 1
             
             if count > 0:
@@ -228,8 +637,8 @@ class SignatureDatabase:
             True if exported successfully
         """
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.signatures, f, indent=2)
+            with open(file_path, 'wb') as f:
+                f.write(dumps_json(self.signatures, indent=True))
             print(f"✅ Exported {len(self.signatures)} signatures to {file_path}")
             return True
         except OSError as e:
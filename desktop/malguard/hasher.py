@@ -4,14 +4,76 @@ Computes cryptographic hashes (SHA-256) for files.
 """
 
 import hashlib
+import mmap
+import os
+import sqlite3
+import sys
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+
+from .utils import get_config_dir
+
+# hashlib.file_digest (3.11+) runs the read/update loop in C
+HAS_FILE_DIGEST = sys.version_info >= (3, 11)
+
+
+def _hash_constructor(algorithm: str):
+    """
+    Constructor for a hash algorithm.
+    
+    Guaranteed algorithms use their named constructors (hashlib.sha256 etc.),
+    which are bound directly to OpenSSL (SHA-NI where the CPU has it)
+    instead of going through hashlib.new's name lookup.
+    """
+    if algorithm in hashlib.algorithms_guaranteed:
+        return getattr(hashlib, algorithm)
+    return lambda: hashlib.new(algorithm)
 
 
 class FileHasher:
     """Handles file hash computation."""
     
-    CHUNK_SIZE = 4096  # Read files in 4KB chunks for memory efficiency
+    CHUNK_SIZE = 1 << 20  # Read files in 1 MiB chunks: few syscalls, bounded memory
+    
+    # Files in this size range are hashed from a memory map, which skips the
+    # copy read() makes. Below it mapping costs more than it saves; above it
+    # the chunked read keeps the mapping from crowding the page cache.
+    MMAP_MIN_SIZE = 64 << 10
+    MMAP_MAX_SIZE = 256 << 20
+    
+    @staticmethod
+    def _hash_mapped(f, constructor) -> Optional[str]:
+        """Hash an open file through mmap, or None if it can't be mapped."""
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                hasher = constructor()
+                hasher.update(mm)
+                return hasher.hexdigest()
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _hash_file(file_path: Path, algorithm: str) -> str:
+        """Hash a file's contents, raising on I/O errors or unknown algorithms."""
+        # Unbuffered: file_digest and the chunked loop do their own buffering
+        constructor = _hash_constructor(algorithm)
+        with open(file_path, 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if FileHasher.MMAP_MIN_SIZE <= size <= FileHasher.MMAP_MAX_SIZE:
+                digest = FileHasher._hash_mapped(f, constructor)
+                if digest is not None:
+                    return digest
+            if HAS_FILE_DIGEST:
+                return hashlib.file_digest(f, constructor).hexdigest()
+            hasher = constructor()
+            read = f.read
+            chunk_size = FileHasher.CHUNK_SIZE
+            while chunk := read(chunk_size):
+                hasher.update(chunk)
+            return hasher.hexdigest()
     
     @staticmethod
     def calculate_sha256(file_path: Path) -> Optional[str]:
@@ -25,15 +87,33 @@ class FileHasher:
             Hex string of SHA-256 hash, or None if error
         """
         try:
-            hasher = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(FileHasher.CHUNK_SIZE), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            return FileHasher._hash_file(file_path, 'sha256')
         except (OSError, IOError, PermissionError) as e:
             print(f"❌ Hash error for {file_path}: {e}")
             return None
     
+    @staticmethod
+    def calculate_sha256_stream(stream, buffer: bytearray) -> str:
+        """
+        Calculate SHA-256 hash of a binary stream (e.g. a ZIP member).
+        
+        The stream is read into buffer, so hashing takes no memory beyond
+        it however large the stream is. Read errors are raised.
+        
+        Args:
+            stream: Binary file-like object with readinto()
+            buffer: Reusable read buffer
+            
+        Returns:
+            Hex string of SHA-256 hash
+        """
+        hasher = hashlib.sha256()
+        view = memoryview(buffer)
+        readinto = stream.readinto
+        while n := readinto(buffer):
+            hasher.update(view[:n])
+        return hasher.hexdigest()
+    
     @staticmethod
     def calculate_sha256_bytes(data: bytes) -> Optional[str]:
         """
@@ -64,14 +144,155 @@ class FileHasher:
             Hex string of hash, or None if error
         """
         try:
-            hasher = hashlib.new(algorithm)
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(FileHasher.CHUNK_SIZE), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            return FileHasher._hash_file(file_path, algorithm)
         except (OSError, IOError, PermissionError) as e:
             print(f"❌ Hash error for {file_path}: {e}")
             return None
         except ValueError as e:
             print(f"❌ Invalid hash algorithm '{algorithm}': {e}")
             return None
+
+
+class HashCache:
+    """
+    Persistent cache of file SHA-256 hashes.
+    
+    Entries are keyed by absolute path and only reused while the file's
+    mtime, size, inode and ctime are unchanged, so edited files are
+    re-hashed. The ctime can't be set from userspace, so a file rewritten
+    and then given its old mtime back (touch -r) is re-hashed too. New
+    entries are buffered and written in one transaction by flush().
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        """
+        Initialize hash cache.
+        
+        Args:
+            db_path: Custom path to cache database (default: config dir)
+        """
+        if db_path:
+            self.db_file = Path(db_path)
+        else:
+            self.db_file = get_config_dir() / "hash_cache.db"
+        
+        # path -> (mtime_ns, size, ino, ctime_ns, sha256), loaded on first use
+        self._entries: Optional[Dict[str, Tuple[int, int, int, int, str]]] = None
+        self._pending: List[Tuple[str, int, int, int, int, str]] = []
+        # Directory scans hash from several threads
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database, creating the table if needed."""
+        conn = sqlite3.connect(str(self.db_file))
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Entries keyed by mtime and size alone, from before ino and ctime
+        # were recorded
+        conn.execute("DROP TABLE IF EXISTS hashes")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+            "ino INTEGER, ctime_ns INTEGER, sha256 TEXT)"
+        )
+        return conn
+    
+    @staticmethod
+    def _version(st: os.stat_result) -> Tuple[int, int, int, int]:
+        """The stat fields an entry is only reused while unchanged."""
+        return st.st_mtime_ns, st.st_size, st.st_ino, st.st_ctime_ns
+    
+    def _load(self) -> Dict[str, Tuple[int, int, int, int, str]]:
+        """Read all cached entries into memory once."""
+        with self._lock:
+            if self._entries is None:
+                try:
+                    conn = self._connect()
+                    try:
+                        rows = conn.execute(
+                            "SELECT path, mtime_ns, size, ino, ctime_ns, sha256 "
+                            "FROM file_hashes"
+                        ).fetchall()
+                    finally:
+                        conn.close()
+                except sqlite3.Error as e:
+                    print(f"⚠️  Could not read hash cache: {e}")
+                    rows = []
+                self._entries = {row[0]: row[1:] for row in rows}
+            return self._entries
+    
+    def lookup(self, file_path: Path, st: os.stat_result) -> Optional[str]:
+        """
+        Cached SHA-256 of a file, without hashing it.
+        
+        Args:
+            file_path: Path to the file
+            st: The file's stat result
+            
+        Returns:
+            Hex string of SHA-256 hash, or None if not cached for this
+            version of the file
+        """
+        entry = self._load().get(str(file_path))
+        if entry and entry[:4] == self._version(st):
+            return entry[4]
+        return None
+    
+    def calculate_sha256(self, file_path: Path,
+                         st: Optional[os.stat_result] = None,
+                         data=None) -> Optional[str]:
+        """
+        SHA-256 of a file, from the cache if the file is unchanged.
+        
+        Args:
+            file_path: Path to the file
+            st: The file's stat result, if the caller already has it
+            data: The file's contents (e.g. a memory map of it), hashed
+                on a cache miss instead of reading the file again
+            
+        Returns:
+            Hex string of SHA-256 hash, or None if error
+        """
+        path = str(file_path)
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return FileHasher.calculate_sha256(file_path)
+        
+        file_hash = self.lookup(file_path, st)
+        if file_hash is not None:
+            return file_hash
+        
+        if data is not None:
+            file_hash = FileHasher.calculate_sha256_bytes(data)
+        else:
+            file_hash = FileHasher.calculate_sha256(file_path)
+        if file_hash:
+            entry = self._version(st) + (file_hash,)
+            with self._lock:
+                self._entries[path] = entry
+                self._pending.append((path,) + entry)
+        return file_hash
+    
+    def flush(self) -> None:
+        """Write newly computed hashes to the cache database."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        
+        if not pending:
+            return
+        
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO file_hashes "
+                        "(path, mtime_ns, size, ino, ctime_ns, sha256) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        pending
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not save hash cache: {e}")
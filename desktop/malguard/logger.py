@@ -3,34 +3,69 @@ Scan Logger Module
 Logs scan results to JSONL file for audit and history.
 """
 
+import atexit
 import json
+import logging
+import os
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
-from .utils import get_config_dir
+from .utils import get_config_dir, dumps_json, loads_json
+
+_log = logging.getLogger(__name__)
 
 
 class ScanLogger:
     """
     Logs scan results to a JSONL (JSON Lines) file.
     Each line is a complete JSON object for easy parsing and streaming.
+    
+    Records are buffered and appended in one write once FLUSH_BYTES are
+    pending or FLUSH_DELAY seconds after the first buffered record, and
+    when the process exits.
+    
+    Two sidecar files are kept next to the log so stats and detections
+    don't re-read it: scan_stats.json (running counters, plus the log size
+    they cover) and scan_detections.jsonl (detection records only). If the
+    log changes behind their back, they are rebuilt from it on next use.
     """
     
-    def __init__(self, log_path: Optional[Path] = None):
+    FLUSH_BYTES = 64 << 10
+    FLUSH_DELAY = 0.05
+    
+    def __init__(self, log_path: Optional[Path] = None, fsync: bool = False):
         """
         Initialize scan logger.
         
         Args:
             log_path: Custom path to log file (default: config dir)
+            fsync: fsync the log file after each flush, for crash consistency
         """
         if log_path:
             self.log_file = Path(log_path)
         else:
             self.log_file = get_config_dir() / "scan_history.jsonl"
         
+        self.stats_file = self.log_file.with_name("scan_stats.json")
+        self.detections_file = self.log_file.with_name("scan_detections.jsonl")
+        
         # Ensure parent directory exists
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Directory scans log from several threads
+        self._lock = threading.Lock()
+        self._buf: List[bytes] = []
+        self._buf_bytes = 0
+        # Counter increments and detection lines for the buffered records
+        self._pending_counts = self._zero_counts()
+        self._pending_detections: List[bytes] = []
+        self._timer: Optional[threading.Timer] = None
+        # Log file handle, opened on the first flush and kept open
+        self._fh = None
+        self.fsync = fsync
+        atexit.register(self.close)
     
     def log(self, result: Dict[str, Any]) -> bool:
         """
@@ -47,14 +82,171 @@ class ScanLogger:
             if 'timestamp' not in result:
                 result['timestamp'] = datetime.now().isoformat()
             
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(result, separators=(',', ':')) + '\n')
+            line = dumps_json(result) + b'\n'
+            with self._lock:
+                self._buf.append(line)
+                self._buf_bytes += len(line)
+                
+                self._pending_counts['total_scans'] += 1
+                if result.get('detected', False):
+                    self._pending_counts['detections'] += 1
+                    self._pending_detections.append(line)
+                if result.get('reason') == 'skipped':
+                    self._pending_counts['skipped'] += 1
+                
+                if self._buf_bytes >= self.FLUSH_BYTES:
+                    return self._flush_locked()
+                
+                if self._timer is None:
+                    self._timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
             
             return True
             
         except OSError as e:
-            print(f"❌ Error writing to scan log: {e}")
+            _log.error("Error writing to scan log: %s", e)
+            return False
+    
+    def flush(self) -> bool:
+        """
+        Write buffered records to the log file.
+        
+        Returns:
+            True if written successfully (or nothing was pending)
+        """
+        with self._lock:
+            return self._flush_locked()
+    
+    def _flush_locked(self) -> bool:
+        """Write buffered records; the caller holds the lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        if not self._buf:
+            return True
+        
+        data = b''.join(self._buf)
+        counts, detections = self._pending_counts, self._pending_detections
+        self._buf = []
+        self._buf_bytes = 0
+        self._pending_counts = self._zero_counts()
+        self._pending_detections = []
+        
+        try:
+            if self._fh is None:
+                self._fh = open(self.log_file, 'ab', buffering=1 << 16)
+            size_before = os.fstat(self._fh.fileno()).st_size
+            self._fh.write(data)
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+        except OSError as e:
+            _log.error("Error writing to scan log: %s", e)
             return False
+        
+        self._update_sidecars(size_before, size_before + len(data), counts, detections)
+        return True
+    
+    @staticmethod
+    def _zero_counts() -> Dict[str, int]:
+        return {'total_scans': 0, 'detections': 0, 'skipped': 0}
+    
+    def _read_stats(self) -> Optional[Dict[str, int]]:
+        """Read the counters file, or None if it is missing or unreadable."""
+        try:
+            with open(self.stats_file, 'rb') as f:
+                stats = loads_json(f.read())
+            return stats if isinstance(stats, dict) else None
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def _write_stats(self, stats: Dict[str, int]) -> None:
+        """Replace the counters file atomically (write temp file, rename)."""
+        tmp = self.stats_file.with_suffix(".tmp")
+        with open(tmp, 'wb') as f:
+            f.write(dumps_json(stats))
+        os.replace(tmp, self.stats_file)
+    
+    def _remove_sidecars(self) -> None:
+        for path in (self.stats_file, self.detections_file):
+            if path.exists():
+                path.unlink()
+    
+    def _update_sidecars(self, size_before: int, size_after: int,
+                         counts: Dict[str, int], detections: List[bytes]) -> None:
+        """Add a flushed batch to the counters and detections files."""
+        try:
+            stats = self._read_stats()
+            if stats is None and size_before == 0:
+                stats = dict(self._zero_counts(), log_size=0)
+            
+            if stats is None or stats.get('log_size') != size_before:
+                # Out of step with the log (another writer, or an older
+                # version); drop them and rebuild when next needed
+                self._remove_sidecars()
+                return
+            
+            if detections:
+                with open(self.detections_file, 'ab') as f:
+                    f.write(b''.join(detections))
+            for key, value in counts.items():
+                stats[key] = stats.get(key, 0) + value
+            stats['log_size'] = size_after
+            self._write_stats(stats)
+        except OSError as e:
+            _log.warning("Could not update scan stats: %s", e)
+    
+    def _current_stats(self) -> Dict[str, int]:
+        """
+        Counters covering the whole log, rebuilding the sidecars if stale.
+        
+        The caller holds the lock, with nothing left to flush.
+        """
+        log_size = self.log_file.stat().st_size if self.log_file.exists() else 0
+        stats = self._read_stats()
+        if stats is not None and stats.get('log_size') == log_size:
+            return stats
+        
+        # Rebuild both sidecars with one pass over the log
+        stats = dict(self._zero_counts(), log_size=log_size)
+        detections = []
+        if log_size:
+            with open(self.log_file, 'rb') as f:
+                for line in f:
+                    if line == b'\n':
+                        continue
+                    try:
+                        record = loads_json(line)
+                    except json.JSONDecodeError:
+                        continue
+                    stats['total_scans'] += 1
+                    if record.get('detected', False):
+                        stats['detections'] += 1
+                        detections.append(line if line.endswith(b'\n') else line + b'\n')
+                    if record.get('reason') == 'skipped':
+                        stats['skipped'] += 1
+        
+        with open(self.detections_file, 'wb') as f:
+            f.write(b''.join(detections))
+        self._write_stats(stats)
+        return stats
+    
+    def _close_locked(self) -> None:
+        """Close the log file handle; the caller holds the lock."""
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+    
+    def close(self) -> None:
+        """Write buffered records and close the log file."""
+        with self._lock:
+            self._flush_locked()
+            self._close_locked()
     
     def get_history(self, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -66,27 +258,53 @@ class ScanLogger:
         Returns:
             List of scan results (most recent first)
         """
+        self.flush()
+        
         if not self.log_file.exists():
             return []
         
         try:
+            # Read from the end, so only the newest entries are parsed.
+            # Lines stay bytes; blank ones are skipped cheaply and anything
+            # else unparseable fails in the decoder, so no strip() copies
             results = []
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        try:
-                            results.append(json.loads(line))
-                        except json.JSONDecodeError:
-                            continue
+            for line in self._tail_lines(self.log_file):
+                if line:
+                    try:
+                        results.append(loads_json(line))
+                    except json.JSONDecodeError:
+                        continue
+                    if len(results) == limit:
+                        break
             
-            # Return most recent first
-            return list(reversed(results[-limit:]))
+            return results
             
         except OSError as e:
-            print(f"❌ Error reading scan log: {e}")
+            _log.error("Error reading scan log: %s", e)
             return []
     
+    @staticmethod
+    def _tail_lines(path: Path, chunk_size: int = 64 << 10) -> Iterator[bytes]:
+        """
+        Yield a file's lines from last to first.
+        
+        The file is read backwards in chunks, so stopping early leaves the
+        rest of the file unread.
+        """
+        with open(path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            partial = b''
+            while position > 0:
+                read_size = min(chunk_size, position)
+                position -= read_size
+                f.seek(position)
+                lines = (f.read(read_size) + partial).split(b'\n')
+                # The first piece may continue in the previous chunk
+                partial = lines[0]
+                for line in reversed(lines[1:]):
+                    yield line
+            yield partial
+    
     def get_detections_only(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Get only entries where malware was detected.
@@ -97,9 +315,27 @@ class ScanLogger:
         Returns:
             List of detection results (most recent first)
         """
-        history = self.get_history(limit=1000)  # Get more to filter
-        detections = [r for r in history if r.get('detected', False)]
-        return detections[:limit]
+        try:
+            with self._lock:
+                self._flush_locked()
+                self._current_stats()
+            
+            detections = []
+            if not self.detections_file.exists():
+                return detections
+            for line in self._tail_lines(self.detections_file):
+                if line:
+                    try:
+                        detections.append(loads_json(line))
+                    except json.JSONDecodeError:
+                        continue
+                    if len(detections) == limit:
+                        break
+            return detections
+            
+        except OSError as e:
+            _log.error("Error reading scan log: %s", e)
+            return []
     
     def get_stats(self) -> Dict[str, int]:
         """
@@ -108,11 +344,17 @@ class ScanLogger:
         Returns:
             Dictionary with total_scans, detections, clean counts
         """
-        history = self.get_history(limit=10000)
+        try:
+            with self._lock:
+                self._flush_locked()
+                stats = self._current_stats()
+        except OSError as e:
+            _log.error("Error reading scan log: %s", e)
+            stats = self._zero_counts()
         
-        total = len(history)
-        detections = sum(1 for r in history if r.get('detected', False))
-        skipped = sum(1 for r in history if r.get('reason') == 'skipped')
+        total = stats['total_scans']
+        detections = stats['detections']
+        skipped = stats['skipped']
         clean = total - detections - skipped
         
         return {
@@ -130,10 +372,22 @@ class ScanLogger:
             True if cleared successfully
         """
         try:
-            if self.log_file.exists():
-                self.log_file.unlink()
+            with self._lock:
+                # Drop records that haven't been written yet as well
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._buf = []
+                self._buf_bytes = 0
+                self._pending_counts = self._zero_counts()
+                self._pending_detections = []
+                self._close_locked()
+                
+                if self.log_file.exists():
+                    self.log_file.unlink()
+                self._remove_sidecars()
             print("✅ Scan history cleared")
             return True
         except OSError as e:
-            print(f"❌ Error clearing scan log: {e}")
+            _log.error("Error clearing scan log: %s", e)
             return False
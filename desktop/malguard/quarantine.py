@@ -3,43 +3,213 @@ Quarantine Manager
 Safely isolates detected malware files.
 """
 
-import json
+import errno
+import hashlib
+import logging
+import os
 import shutil
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 
-from .utils import get_config_dir
+from .utils import get_config_dir, loads_json
+
+_log = logging.getLogger(__name__)
 
 
 class QuarantineManager:
-    """Manages quarantined files."""
+    """
+    Manages quarantined files.
+    
+    Quarantine metadata lives in a SQLite manifest (manifest.db), so each
+    operation touches only its own row. A manifest.json from older versions
+    is imported on first use.
+    
+    Entries store just the quarantined file's name; it always lives in
+    quarantine_dir, which is held open as a directory fd where supported.
+    """
     
-    def __init__(self, quarantine_dir: Optional[Path] = None):
+    # Largest part of manifest.db that SQLite memory-maps for reads
+    MMAP_SIZE = 64 << 20
+    
+    # Manifest columns, after the composite key
+    _COLUMNS = ("file_hash", "original_name", "original_path", "quarantine_path",
+                "malware_name", "severity", "quarantined_on")
+    
+    def __init__(self, quarantine_dir: Optional[Path] = None, fsync: bool = False):
+        """
+        Initialize quarantine manager.
+        
+        Args:
+            quarantine_dir: Custom quarantine directory (default: config dir)
+            fsync: Sync each manifest change to disk before the file is moved,
+                so a crash can't leave a quarantined file with no entry
+        """
         if quarantine_dir:
             self.quarantine_dir = quarantine_dir
         else:
             self.quarantine_dir = get_config_dir() / "quarantine"
         
-        self.manifest_file = self.quarantine_dir / "manifest.json"
+        self.manifest_file = self.quarantine_dir / "manifest.db"
+        self.fsync = fsync
         self._ensure_dir()
+        
+        # One connection shared by all threads; directory scans quarantine
+        # from several threads, so every use holds the lock
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._migrate_json_manifest()
+        
+        # Unlinks relative to this fd skip resolving the full path each time
+        self._dfd: Optional[int] = None
+        if os.unlink in os.supports_dir_fd:
+            self._dfd = os.open(self.quarantine_dir, os.O_RDONLY | os.O_DIRECTORY)
+    
+    def close(self):
+        """Close the manifest database and the quarantine directory fd."""
+        if self._dfd is not None:
+            os.close(self._dfd)
+            self._dfd = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
     
     def _ensure_dir(self):
         """Ensure quarantine directory exists."""
         self.quarantine_dir.mkdir(parents=True, exist_ok=True)
     
-    def _load_manifest(self) -> Dict[str, Any]:
-        """Load quarantine manifest."""
-        if self.manifest_file.exists():
-            with open(self.manifest_file, 'r') as f:
-                return json.load(f)
-        return {"files": {}, "metadata": {"created": datetime.now().isoformat()}}
+    def _connect(self) -> sqlite3.Connection:
+        """Open the manifest database, creating the table if needed."""
+        conn = sqlite3.connect(str(self.manifest_file), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL appends each change to the -wal file and checkpoints it into
+        # the database in the background; FULL also syncs every commit
+        conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        # Read pages through a shared mapping rather than read() copies, so
+        # concurrent CLI invocations use the same page-cache pages
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "composite_key TEXT PRIMARY KEY, file_hash TEXT, original_name TEXT, "
+            "original_path TEXT, quarantine_path TEXT, malware_name TEXT, "
+            "severity TEXT, quarantined_on TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_hash_prefix ON files(file_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_original_name ON files(original_name)")
+        conn.commit()
+        return conn
+    
+    def _migrate_json_manifest(self):
+        """Import entries from a legacy manifest.json, then remove it."""
+        json_file = self.quarantine_dir / "manifest.json"
+        if not json_file.exists():
+            return
+        
+        with open(json_file, 'rb') as f:
+            files = loads_json(f.read()).get("files", {})
+        
+        rows = []
+        for key, info in files.items():
+            # Very old entries didn't store the hash separately
+            info.setdefault("file_hash", self._parse_key(key)[0])
+            rows.append((key,) + tuple(info.get(c) for c in self._COLUMNS))
+        
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO files VALUES ({', '.join('?' * 8)})", rows
+            )
+        json_file.unlink()
+    
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry for a composite key; the caller holds the lock."""
+        row = self._conn.execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM files WHERE composite_key = ?",
+            (key,)
+        ).fetchone()
+        return dict(zip(self._COLUMNS, row)) if row else None
+    
+    def _match_keys(self, key_or_hash: str) -> List[str]:
+        """
+        Keys starting with key_or_hash, or whose original name equals it;
+        the caller holds the lock.
+        """
+        # A range on the primary key, so the prefix match uses its index
+        # (LIKE would treat '_' in file names as a wildcard)
+        matches = [row[0] for row in self._conn.execute(
+            "SELECT composite_key FROM files "
+            "WHERE composite_key >= ? AND composite_key < ? ORDER BY composite_key",
+            (key_or_hash, key_or_hash + "\U0010ffff")
+        )]
+        for (key,) in self._conn.execute(
+            "SELECT composite_key FROM files WHERE original_name = ?", (key_or_hash,)
+        ):
+            if key not in matches:
+                matches.append(key)
+        return matches
+    
+    def _resolve_key(self, key_or_hash: str) -> tuple:
+        """
+        Find the single entry matching a composite key, hash prefix or
+        file name; the caller holds the lock.
+        
+        Returns:
+            (composite key, entry), or (None, None) if nothing or more than
+            one entry matches
+        """
+        # Try exact match first
+        file_info = self._get_entry(key_or_hash)
+        if file_info:
+            return key_or_hash, file_info
+        
+        # Try matching by hash prefix or exact filename
+        matches = self._match_keys(key_or_hash)
+        if len(matches) == 1:
+            return matches[0], self._get_entry(matches[0])
+        
+        if len(matches) > 1:
+            print(f"⚠️  Multiple matches found. Be more specific:")
+            for m in matches[:5]:
+                hash_part, name_part = self._parse_key(m)
+                print(f"   - {name_part} (hash: {hash_part[:8]}...)")
+        return None, None
+    
+    def _quarantine_path(self, stored: str) -> Path:
+        """Full path of a quarantined file from its manifest entry."""
+        # Older entries stored the full path; only the name is needed
+        return self.quarantine_dir / Path(stored).name
+    
+    def _unlink(self, stored: str):
+        """Delete a quarantined file; raises FileNotFoundError if it's gone."""
+        if self._dfd is not None:
+            os.unlink(Path(stored).name, dir_fd=self._dfd)
+        else:
+            self._quarantine_path(stored).unlink()
+    
+    @staticmethod
+    def _move(src: Path, dst: Path):
+        """
+        Move a file, as a single rename when src and dst share a filesystem.
+        
+        shutil.move is only used for what a rename can't do: moving across
+        filesystems (copy + delete) or into an existing directory.
+        """
+        if not dst.is_dir():
+            try:
+                os.replace(src, dst)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        shutil.move(str(src), str(dst))
     
-    def _save_manifest(self, manifest: Dict[str, Any]):
-        """Save quarantine manifest."""
-        manifest["metadata"]["updated"] = datetime.now().isoformat()
-        with open(self.manifest_file, 'w') as f:
-            json.dump(manifest, f, indent=2, default=str)
     def _generate_key(self, file_hash: str, filename: str) -> str:
         """Generate a unique key for quarantine using hash and filename."""
         # Use hash:filename as composite key to allow multiple files with same hash
@@ -76,38 +246,35 @@ class QuarantineManager:
         composite_key = self._generate_key(file_hash, file_path.name)
         
         # Generate unique quarantine filename
-        import hashlib
-        key_hash = hashlib.md5(composite_key.encode()).hexdigest()[:12]
+        key_hash = hashlib.blake2b(composite_key.encode(), digest_size=6).hexdigest()
         quarantine_name = f"{file_hash[:8]}_{key_hash}.quarantine"
         quarantine_path = self.quarantine_dir / quarantine_name
         
-        manifest = self._load_manifest()
-        
-        # Check if this exact file is already quarantined
-        if composite_key in manifest["files"]:
-            return False  # Already quarantined
-        
-        try:
-            # Move file to quarantine
-            shutil.move(str(file_path), str(quarantine_path))
+        with self._lock:
+            # Claim the key; an existing row means this exact file is
+            # already quarantined
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (composite_key, file_hash, file_path.name, str(file_path),
+                     quarantine_name, malware_name, severity,
+                     datetime.now().isoformat())
+                )
+            if cursor.rowcount == 0:
+                return False  # Already quarantined
             
-            # Update manifest with composite key
-            manifest["files"][composite_key] = {
-                "original_path": str(file_path),
-                "original_name": file_path.name,
-                "file_hash": file_hash,  # Store hash separately for lookup
-                "quarantine_path": str(quarantine_path),
-                "malware_name": malware_name,
-                "severity": severity,
-                "quarantined_on": datetime.now().isoformat()
-            }
-            self._save_manifest(manifest)
-            
-            return True
+            try:
+                # Move file to quarantine
+                self._move(file_path, quarantine_path)
+                return True
             
-        except Exception as e:
-            print(f"Error quarantining file: {e}")
-            return False
+            except Exception as e:
+                _log.error("Error quarantining file: %s", e)
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM files WHERE composite_key = ?", (composite_key,)
+                    )
+                return False
     
     def restore_file(self, key_or_hash: str, restore_path: Optional[Path] = None) -> bool:
         """
@@ -120,151 +287,118 @@ class QuarantineManager:
         Returns:
             True if successful, False otherwise
         """
-        manifest = self._load_manifest()
-        
-        target_key = None
-        
-        # Try exact match first
-        if key_or_hash in manifest["files"]:
-            target_key = key_or_hash
-        else:
-            # Try matching by hash prefix or exact filename
-            matches = []
-            for k in manifest["files"]:
-                file_hash, filename = self._parse_key(k)
-                # Match if: starts with input, OR filename matches exactly
-                if k.startswith(key_or_hash) or (filename and filename == key_or_hash):
-                    matches.append(k)
-            
-            if len(matches) == 1:
-                target_key = matches[0]
-            elif len(matches) > 1:
-                print(f"⚠️  Multiple matches found. Be more specific:")
-                for m in matches[:5]:
-                    hash_part, name_part = self._parse_key(m)
-                    print(f"   - {name_part} (hash: {hash_part[:8]}...)")
+        with self._lock:
+            target_key, file_info = self._resolve_key(key_or_hash)
+            if not target_key:
                 return False
-        
-        if not target_key:
-            return False
-        
-        file_info = manifest["files"][target_key]
-        quarantine_path = Path(file_info["quarantine_path"])
-        
-        if not quarantine_path.exists():
-            return False
-        
-        # Determine restore location
-        if restore_path:
-            target_path = Path(restore_path)
-        else:
-            target_path = Path(file_info["original_path"])
-        
-        try:
-            # Ensure parent directory exists
-            target_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Move file back
-            shutil.move(str(quarantine_path), str(target_path))
+            quarantine_path = self._quarantine_path(file_info["quarantine_path"])
             
-            # Update manifest
-            del manifest["files"][target_key]
-            self._save_manifest(manifest)
+            if not quarantine_path.exists():
+                return False
             
-            return True
+            # Determine restore location
+            if restore_path:
+                target_path = Path(restore_path)
+            else:
+                target_path = Path(file_info["original_path"])
             
-        except Exception as e:
-            print(f"Error restoring file: {e}")
-            return False
+            try:
+                # Ensure parent directory exists
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+                
+                # Move file back
+                self._move(quarantine_path, target_path)
+                
+                # Update manifest
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM files WHERE composite_key = ?", (target_key,)
+                    )
+                
+                return True
+                
+            except Exception as e:
+                _log.error("Error restoring file: %s", e)
+                return False
     
     def list_quarantined(self) -> List[Dict[str, Any]]:
         """List all quarantined files."""
-        manifest = self._load_manifest()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT composite_key, file_hash, original_name, malware_name, "
+                "severity, quarantined_on, original_path FROM files ORDER BY rowid"
+            ).fetchall()
         
-        result = []
-        for key, info in manifest["files"].items():
-            # Parse hash from composite key for backwards compatibility
-            file_hash = info.get("file_hash")
-            if not file_hash:
-                file_hash, _ = self._parse_key(key)
-            
-            result.append({
+        return [
+            {
                 "key": key,
                 "hash": file_hash,
-                "original_name": info.get("original_name"),
-                "malware_name": info.get("malware_name"),
-                "severity": info.get("severity"),
-                "quarantined_on": info.get("quarantined_on"),
-                "original_path": info.get("original_path")
-            })
-        
-        return result
+                "original_name": original_name,
+                "malware_name": malware_name,
+                "severity": severity,
+                "quarantined_on": quarantined_on,
+                "original_path": original_path
+            }
+            for (key, file_hash, original_name, malware_name,
+                 severity, quarantined_on, original_path) in rows
+        ]
     
     def delete_quarantined(self, key_or_hash: str) -> bool:
         """Permanently delete a quarantined file."""
-        manifest = self._load_manifest()
-        
-        target_key = None
-        
-        # Try exact match first
-        if key_or_hash in manifest["files"]:
-            target_key = key_or_hash
-        else:
-            # Try matching by hash prefix or exact filename
-            matches = []
-            for k in manifest["files"]:
-                file_hash, filename = self._parse_key(k)
-                # Match if: starts with input, OR filename matches exactly
-                if k.startswith(key_or_hash) or (filename and filename == key_or_hash):
-                    matches.append(k)
-            
-            if len(matches) == 1:
-                target_key = matches[0]
-            elif len(matches) > 1:
-                print(f"⚠️  Multiple matches found. Be more specific:")
-                for m in matches[:5]:
-                    hash_part, name_part = self._parse_key(m)
-                    print(f"   - {name_part} (hash: {hash_part[:8]}...)")
+        with self._lock:
+            target_key, file_info = self._resolve_key(key_or_hash)
+            if not target_key:
                 return False
-        
-        if not target_key:
-            return False
-        
-        file_info = manifest["files"][target_key]
-        quarantine_path = Path(file_info["quarantine_path"])
-        
-        try:
-            if quarantine_path.exists():
-                quarantine_path.unlink()
-            
-            del manifest["files"][target_key]
-            self._save_manifest(manifest)
-            
-            return True
             
-        except Exception as e:
-            print(f"Error deleting file: {e}")
-            return False
+            try:
+                try:
+                    self._unlink(file_info["quarantine_path"])
+                except FileNotFoundError:
+                    pass
+                
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM files WHERE composite_key = ?", (target_key,)
+                    )
+                
+                return True
+                
+            except Exception as e:
+                _log.error("Error deleting file: %s", e)
+                return False
     
     def count(self) -> int:
         """Count quarantined files."""
-        manifest = self._load_manifest()
-        return len(manifest["files"])
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
     
     def clear_all(self) -> int:
         """Delete all quarantined files."""
-        manifest = self._load_manifest()
-        count = 0
-        
-        for file_hash, info in list(manifest["files"].items()):
-            quarantine_path = Path(info["quarantine_path"])
-            try:
-                if quarantine_path.exists():
-                    quarantine_path.unlink()
-                del manifest["files"][file_hash]
-                count += 1
-            except Exception:
-                pass
-        
-        self._save_manifest(manifest)
-        return count
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT composite_key, quarantine_path FROM files"
+            ).fetchall()
+            
+            # Unlink everything first, then update the manifest once
+            removed = []
+            failed = False
+            for key, quarantine_path in rows:
+                try:
+                    self._unlink(quarantine_path)
+                except FileNotFoundError:
+                    pass
+                except Exception:
+                    failed = True
+                    continue
+                removed.append((key,))
+            
+            with self._conn:
+                if failed:
+                    # Keep entries whose files couldn't be deleted
+                    self._conn.executemany(
+                        "DELETE FROM files WHERE composite_key = ?", removed
+                    )
+                else:
+                    self._conn.execute("DELETE FROM files")
+            return len(removed)
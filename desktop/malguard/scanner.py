@@ -3,36 +3,101 @@ Scanner Module
 Core file and directory scanning logic.
 """
 
+import os
+import queue
+import stat
+import time
 import zipfile
 import io
+import itertools
+import mmap
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, Deque, Iterator, List, Optional, Callable, Tuple
 
-from .hasher import FileHasher
+from .hasher import FileHasher, HashCache
 from .database import SignatureDatabase
 from .logger import ScanLogger
-from .yara_engine import YaraEngine
-from .utils import is_suspicious_file, format_file_size
+from .yara_engine import YaraEngine, YaraTimeoutError
+from .utils import SUSPICIOUS_EXTENSIONS, format_file_size
 
 # Supported archive extensions
-ARCHIVE_EXTENSIONS = {'.zip'}
+ARCHIVE_EXTENSIONS = frozenset({'.zip'})
+
+# Archive members are hashed through reusable read buffers; the pool holds
+# one per archive being scanned concurrently
+MEMBER_BUFFER_SIZE = 1 << 20
+_BUFFER_POOL: "queue.LifoQueue[bytearray]" = queue.LifoQueue()
+
+
+# (whole second, its isoformat()) of the last timestamp made
+_ts_second: Tuple[int, str] = (0, '')
+
+
+def _timestamp() -> str:
+    """
+    Current local time as datetime.now().isoformat() gives it.
+    
+    The date and time part is formatted once per second and reused, so
+    each result only adds its microseconds.
+    """
+    global _ts_second
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _ts_second
+    if second != cached_second:
+        prefix = datetime.fromtimestamp(second).isoformat()
+        _ts_second = (second, prefix)
+    micros = int((now - second) * 1e6)
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+def _entry_name(entry: os.DirEntry) -> str:
+    """Sort key for directory entries."""
+    return entry.name
+
+
+def _ext(name: str) -> str:
+    """
+    Lowercased extension of a file name, as Path(name).suffix.lower().
+    
+    Archive members are named by strings; this avoids building a Path for
+    each one just to read its suffix.
+    """
+    base = name[max(name.rfind('/'), name.rfind(os.sep)) + 1:]
+    i = base.rfind('.')
+    if 0 < i < len(base) - 1:
+        return base[i:].lower()
+    return ''
 
 
 class ScanResult:
     """Represents a single file scan result."""
     
-    def __init__(self, file_path: Path):
+    # Directory scans create one per file, so no per-instance __dict__
+    __slots__ = ('file_path', 'file_name', 'file_size', 'extension', 'hash',
+                 'detected', 'malware_name', 'severity', 'reason', 'timestamp',
+                 'from_archive')
+    
+    def __init__(self, file_path: Path, stat_result: Optional[os.stat_result] = None):
         self.file_path = str(file_path) if file_path else ""
         self.file_name = file_path.name if file_path else "unknown"
-        self.file_size = file_path.stat().st_size if file_path and file_path.exists() else 0
+        if stat_result is not None:
+            self.file_size = stat_result.st_size
+        else:
+            try:
+                self.file_size = file_path.stat().st_size if file_path else 0
+            except OSError:
+                self.file_size = 0
         self.extension = file_path.suffix.lower() if file_path else ""
         self.hash: Optional[str] = None
         self.detected = False
         self.malware_name: Optional[str] = None
         self.severity: Optional[str] = None
         self.reason = "clean"
-        self.timestamp = datetime.now().isoformat()
+        self.timestamp = _timestamp()
         self.from_archive: Optional[str] = None  # Archive path if extracted from ZIP
     
     @classmethod
@@ -42,13 +107,13 @@ class ScanResult:
         result.file_path = f"{archive_path}/{filename}" if archive_path else filename
         result.file_name = filename
         result.file_size = len(data)
-        result.extension = Path(filename).suffix.lower()
+        result.extension = _ext(filename)
         result.hash = None
         result.detected = False
         result.malware_name = None
         result.severity = None
         result.reason = "clean"
-        result.timestamp = datetime.now().isoformat()
+        result.timestamp = _timestamp()
         result.from_archive = archive_path
         return result
     
@@ -86,7 +151,8 @@ class Scanner:
                  logger: Optional[ScanLogger] = None,
                  yara_engine: Optional[YaraEngine] = None,
                  quarantine=None,
-                 auto_quarantine: bool = True):
+                 auto_quarantine: bool = True,
+                 hash_cache: Optional[HashCache] = None):
         """
         Initialize scanner with optional custom components.
         
@@ -96,23 +162,26 @@ class Scanner:
             yara_engine: Custom YARA engine (default: auto-create)
             quarantine: QuarantineManager instance for auto-quarantine
             auto_quarantine: Whether to automatically quarantine detected files
+            hash_cache: Custom file hash cache (default: auto-create)
         """
         self.database = database or SignatureDatabase()
         self.logger = logger or ScanLogger()
         self.yara = yara_engine or YaraEngine()
         self.hasher = FileHasher()
+        self.hash_cache = hash_cache or HashCache()
         self.quarantine = quarantine
         self.auto_quarantine = auto_quarantine
     
     @staticmethod
     def is_archive(filename: str) -> bool:
         """Check if file is a supported archive."""
-        ext = Path(filename).suffix.lower()
-        return ext in ARCHIVE_EXTENSIONS
+        return _ext(filename) in ARCHIVE_EXTENSIONS
     
     def scan_bytes(self, data: bytes, filename: str, 
                    skip_non_suspicious: bool = True,
-                   archive_path: str = None) -> ScanResult:
+                   archive_path: str = None,
+                   hash_known_sizes_only: bool = False,
+                   log_result: bool = True) -> ScanResult:
         """
         Scan bytes data for malware.
         
@@ -121,57 +190,112 @@ class Scanner:
             filename: Original filename
             skip_non_suspicious: Skip non-executable files
             archive_path: Parent archive path if from an archive
+            hash_known_sizes_only: Don't hash data whose size no signature
+                has (YARA still runs; the result then carries no hash)
+            log_result: Whether to log the result
             
         Returns:
             ScanResult object
         """
+        result = self._scan_bytes(data, filename, skip_non_suspicious,
+                                  archive_path, hash_known_sizes_only)
+        if log_result:
+            self.logger.log(result.to_dict())
+        return result
+    
+    def _scan_bytes(self, data: bytes, filename: str,
+                    skip_non_suspicious: bool,
+                    archive_path: Optional[str],
+                    hash_known_sizes_only: bool) -> ScanResult:
+        """scan_bytes without logging the result."""
         result = ScanResult.from_bytes(data, filename, archive_path)
         
         # Skip non-suspicious files if requested
-        if skip_non_suspicious and not is_suspicious_file(Path(filename)):
+        if skip_non_suspicious and result.extension not in SUSPICIOUS_EXTENSIONS:
             result.reason = "skipped"
-            self.logger.log(result.to_dict())  # Log all including skipped
-            return result
-        
-        # Calculate hash
-        file_hash = self.hasher.calculate_sha256_bytes(data)
-        if not file_hash:
-            result.reason = "hash_error"
-            self.logger.log(result.to_dict())
             return result
         
-        result.hash = file_hash
-        
-        # Check signature database
-        signature = self.database.lookup(file_hash)
-        if signature:
-            result.detected = True
-            result.malware_name = signature['name']
-            result.severity = signature.get('severity', 'medium')
-            result.reason = "signature_match"
-            self.logger.log(result.to_dict())
-            return result
+        # Data whose size no signature has can't match one
+        if not hash_known_sizes_only or self.database.size_possible(len(data)):
+            # Calculate hash
+            file_hash = self.hasher.calculate_sha256_bytes(data)
+            if not file_hash:
+                result.reason = "hash_error"
+                return result
+            
+            result.hash = file_hash
+            
+            # Check signature database
+            signature = self.database.lookup(file_hash)
+            if signature:
+                result.detected = True
+                result.malware_name = signature['name']
+                result.severity = signature.get('severity', 'medium')
+                result.reason = "signature_match"
+                return result
         
         # Check YARA rules
         if self.yara.is_available():
-            yara_match = self.yara.scan_bytes(data)
+            try:
+                yara_match = self.yara.scan_bytes(data)
+            except YaraTimeoutError:
+                # Not known to be clean
+                result.reason = "yara_timeout"
+                return result
             if yara_match:
                 result.detected = True
                 result.malware_name = yara_match
                 result.severity = "medium"
                 result.reason = "yara_match"
-                self.logger.log(result.to_dict())
                 return result
         
         # File is clean
         result.reason = "clean"
-        self.logger.log(result.to_dict())  # Log clean files too
+        return result
+    
+    def _scan_member_stream(self, zf: zipfile.ZipFile, file_info: zipfile.ZipInfo,
+                            archive_name: str,
+                            hash_known_sizes_only: bool = False) -> ScanResult:
+        """
+        Hash-only scan of an archive member, for when YARA isn't in use.
+        
+        The member is hashed as it is decompressed, through a pooled
+        buffer, so it is never held in memory whole.
+        """
+        result = ScanResult.from_bytes(b'', file_info.filename, archive_name)
+        result.file_size = file_info.file_size
+        
+        # With no signature of this size there's nothing to check, and the
+        # member isn't even decompressed
+        if hash_known_sizes_only and not self.database.size_possible(file_info.file_size):
+            return result
+        
+        try:
+            buffer = _BUFFER_POOL.get_nowait()
+        except queue.Empty:
+            buffer = bytearray(MEMBER_BUFFER_SIZE)
+        try:
+            with zf.open(file_info) as src:
+                result.hash = self.hasher.calculate_sha256_stream(src, buffer)
+        finally:
+            _BUFFER_POOL.put(buffer)
+        
+        # Check signature database
+        signature = self.database.lookup(result.hash)
+        if signature:
+            result.detected = True
+            result.malware_name = signature['name']
+            result.severity = signature.get('severity', 'medium')
+            result.reason = "signature_match"
+        
         return result
     
     def scan_archive(self, archive_path: Path, 
                      skip_non_suspicious: bool = True,
                      max_depth: int = 3,
-                     current_depth: int = 0) -> List[ScanResult]:
+                     current_depth: int = 0,
+                     hash_known_sizes_only: bool = False,
+                     log_result: bool = True) -> List[ScanResult]:
         """
         Extract and scan contents of a ZIP archive.
         
@@ -180,80 +304,104 @@ class Scanner:
             skip_non_suspicious: Skip non-executable files
             max_depth: Maximum recursion depth for nested archives
             current_depth: Current recursion depth
+            hash_known_sizes_only: Don't hash members whose size no
+                signature has
+            log_result: Whether to log the results
             
         Returns:
             List of ScanResult objects for all files in the archive
         """
-        results = []
-        
         if current_depth >= max_depth:
-            return results
+            return []
         
+        results = []
         try:
             with zipfile.ZipFile(archive_path, 'r') as zf:
-                for file_info in zf.infolist():
-                    # Skip directories
-                    if file_info.is_dir():
-                        continue
-                    
-                    try:
-                        # Extract file content
-                        file_content = zf.read(file_info.filename)
-                        inner_filename = file_info.filename
-                        archive_name = str(archive_path)
-                        
-                        # Check if it's a nested archive
-                        if self.is_archive(inner_filename) and current_depth < max_depth - 1:
-                            # Create temp file for nested archive
-                            import tempfile
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tf:
-                                tf.write(file_content)
-                                temp_path = Path(tf.name)
-                            
-                            try:
-                                nested_results = self.scan_archive(
-                                    temp_path,
-                                    skip_non_suspicious=skip_non_suspicious,
-                                    max_depth=max_depth,
-                                    current_depth=current_depth + 1
-                                )
-                                # Update archive path for nested results
-                                for r in nested_results:
-                                    r.from_archive = f"{archive_name}/{inner_filename}"
-                                    r.file_path = f"{archive_name}/{inner_filename}/{r.file_name}"
-                                results.extend(nested_results)
-                            finally:
-                                temp_path.unlink(missing_ok=True)
-                        else:
-                            # Scan the extracted file
-                            result = self.scan_bytes(
-                                data=file_content,
-                                filename=inner_filename,
-                                skip_non_suspicious=skip_non_suspicious,
-                                archive_path=archive_name
-                            )
-                            results.append(result)
-                            
-                    except Exception as e:
-                        # Log error but continue with other files
-                        error_result = ScanResult.from_bytes(b'', file_info.filename, str(archive_path))
-                        error_result.reason = f"extraction_error: {str(e)}"
-                        error_result.file_size = file_info.file_size
-                        self.logger.log(error_result.to_dict())
-                        results.append(error_result)
-                        
+                self._scan_zipfile(zf, str(archive_path), results, skip_non_suspicious,
+                                   max_depth, current_depth, hash_known_sizes_only)
         except zipfile.BadZipFile:
             # Not a valid ZIP file - skip
             pass
         except Exception as e:
             print(f"⚠️  Archive scan error: {e}")
         
+        if log_result:
+            for result in results:
+                self.logger.log(result.to_dict())
         return results
     
+    def _scan_zipfile(self, zf: zipfile.ZipFile, archive_name: str,
+                      results: List[ScanResult],
+                      skip_non_suspicious: bool,
+                      max_depth: int,
+                      current_depth: int,
+                      hash_known_sizes_only: bool) -> None:
+        """
+        Scan the members of an open ZIP archive, appending to results
+        (unlogged).
+        
+        Nested archives are opened from memory and scanned recursively,
+        with archive_name extended by each level ("outer.zip/inner.zip").
+        """
+        for file_info in zf.infolist():
+            # Skip directories
+            if file_info.is_dir():
+                continue
+            
+            try:
+                inner_filename = file_info.filename
+                nested = self.is_archive(inner_filename) and current_depth < max_depth - 1
+                
+                # Members that would be skipped needn't be
+                # decompressed and hashed first
+                if (not nested and skip_non_suspicious
+                        and _ext(inner_filename) not in SUSPICIOUS_EXTENSIONS):
+                    result = ScanResult.from_bytes(b'', inner_filename, archive_name)
+                    result.file_size = file_info.file_size
+                    result.reason = "skipped"
+                    results.append(result)
+                    continue
+                
+                # Check if it's a nested archive
+                if nested:
+                    file_content = zf.read(file_info.filename)
+                    try:
+                        nested_zf = zipfile.ZipFile(io.BytesIO(file_content), 'r')
+                    except zipfile.BadZipFile:
+                        # Not a valid ZIP file - skip
+                        continue
+                    with nested_zf:
+                        self._scan_zipfile(
+                            nested_zf, f"{archive_name}/{inner_filename}", results,
+                            skip_non_suspicious, max_depth, current_depth + 1,
+                            hash_known_sizes_only
+                        )
+                elif not self.yara.is_available():
+                    # Only the hash is needed, so stream the member
+                    # rather than decompressing it into memory
+                    results.append(self._scan_member_stream(
+                        zf, file_info, archive_name, hash_known_sizes_only))
+                else:
+                    # Scan the extracted file
+                    file_content = zf.read(file_info.filename)
+                    result = self._scan_bytes(
+                        file_content, inner_filename, skip_non_suspicious,
+                        archive_name, hash_known_sizes_only
+                    )
+                    results.append(result)
+                    
+            except Exception as e:
+                # Record error but continue with other files
+                error_result = ScanResult.from_bytes(b'', file_info.filename, archive_name)
+                error_result.reason = f"extraction_error: {str(e)}"
+                error_result.file_size = file_info.file_size
+                results.append(error_result)
+    
     def scan_file(self, file_path: Path, 
                   skip_non_suspicious: bool = True,
                   log_result: bool = True,
-                  scan_archives: bool = True) -> Optional[ScanResult]:
+                  scan_archives: bool = True,
+                  hash_known_sizes_only: bool = False) -> Optional[ScanResult]:
         """
         Scan a single file for malware.
         
@@ -262,19 +410,49 @@ class Scanner:
             skip_non_suspicious: Skip non-executable files
             log_result: Whether to log the result
             scan_archives: Extract and scan archive contents
+            hash_known_sizes_only: Don't hash files whose size no signature
+                has (their result then carries no hash)
             
         Returns:
             ScanResult object, or None if file doesn't exist
             For archives, returns the last result (or first detection)
         """
-        file_path = Path(file_path).resolve()
+        try:
+            return self._scan_file(file_path, skip_non_suspicious, log_result,
+                                   scan_archives, hash_known_sizes_only)
+        finally:
+            self.hash_cache.flush()
+    
+    def _scan_file(self, file_path: Path,
+                   skip_non_suspicious: bool,
+                   log_result: bool,
+                   scan_archives: bool,
+                   hash_known_sizes_only: bool,
+                   stat_result: Optional[os.stat_result] = None) -> Optional[ScanResult]:
+        """
+        scan_file without flushing the hash cache.
         
-        if not file_path.is_file():
-            return None
+        With stat_result (from a directory walk) the path is taken as an
+        existing absolute file and isn't resolved or stat'd again.
+        """
+        if stat_result is None:
+            file_path = Path(file_path).resolve()
+            
+            # One stat, reused for the result's size and the hash cache
+            try:
+                stat_result = file_path.stat()
+            except OSError:
+                return None
+            if not stat.S_ISREG(stat_result.st_mode):
+                return None
         
         # Check if this is an archive
         if scan_archives and self.is_archive(str(file_path)):
-            archive_results = self.scan_archive(file_path, skip_non_suspicious)
+            archive_results = self.scan_archive(
+                file_path, skip_non_suspicious,
+                hash_known_sizes_only=hash_known_sizes_only,
+                log_result=log_result
+            )
             if archive_results:
                 # Return first detection, or last result if all clean
                 for r in archive_results:
@@ -282,27 +460,65 @@ class Scanner:
                         return r
                 return archive_results[-1] if archive_results else None
         
-        result = ScanResult(file_path)
+        result = ScanResult(file_path, stat_result)
         
-        # Skip non-suspicious files if requested
-        if skip_non_suspicious and not is_suspicious_file(file_path):
+        # Skip non-suspicious files if requested (the result already has
+        # the lowercased suffix is_suspicious_file would compute)
+        if skip_non_suspicious and result.extension not in SUSPICIOUS_EXTENSIONS:
             result.reason = "skipped"
             if log_result:
                 self.logger.log(result.to_dict())  # Log skipped files
             return result
         
-        # Calculate hash
-        file_hash = self.hasher.calculate_sha256(file_path)
-        if not file_hash:
-            result.reason = "hash_error"
-            if log_result:
-                self.logger.log(result.to_dict())
-            return result
+        signature = None
+        yara_match = None
         
-        result.hash = file_hash
+        mapped = None
+        
+        try:
+            # A file whose size no signature has can't match one
+            if not hash_known_sizes_only or self.database.size_possible(result.file_size):
+                # Calculate hash
+                file_hash = self.hash_cache.lookup(file_path, stat_result)
+                if file_hash is None:
+                    # The file is read to hash it and, unless it matches a
+                    # signature, again by YARA; where the hasher would map
+                    # it anyway, one mapping serves both
+                    if self.yara.is_available():
+                        mapped = self._map_file(file_path, result.file_size)
+                    file_hash = self.hash_cache.calculate_sha256(file_path, stat_result, mapped)
+                if not file_hash:
+                    result.reason = "hash_error"
+                    if log_result:
+                        self.logger.log(result.to_dict())
+                    return result
+                
+                result.hash = file_hash
+                
+                # Check signature database
+                signature = self.database.lookup(file_hash)
+            
+            # Check YARA rules
+            if not signature and self.yara.is_available():
+                try:
+                    if mapped is not None:
+                        yara_match = self.yara.scan_data(mapped)
+                    else:
+                        yara_match = self.yara.scan_file(file_path)
+                except YaraTimeoutError:
+                    # Not known to be clean
+                    result.reason = "yara_timeout"
+                    if log_result:
+                        self.logger.log(result.to_dict())
+                    return result
+                if yara_match and result.hash is None:
+                    result.hash = self.hash_cache.calculate_sha256(
+                        file_path, stat_result, mapped)
+        finally:
+            # Closed before any quarantine moves the file
+            if mapped is not None:
+                mapped.close()
         
-        # Check signature database
-        signature = self.database.lookup(file_hash)
         if signature:
             result.detected = True
             result.malware_name = signature['name']
@@ -318,7 +534,7 @@ class Scanner:
                     self.quarantine.quarantine_file(
                         file_path, 
                         result.malware_name, 
-                        file_hash, 
+                        result.hash, 
                         result.severity
                     )
                 except Exception as e:
@@ -326,31 +542,28 @@ class Scanner:
             
             return result
         
-        # Check YARA rules
-        if self.yara.is_available():
-            yara_match = self.yara.scan_file(file_path)
-            if yara_match:
-                result.detected = True
-                result.malware_name = yara_match
-                result.severity = "medium"
-                result.reason = "yara_match"
-                
-                if log_result:
-                    self.logger.log(result.to_dict())
-                
-                # Auto-quarantine the file
-                if self.auto_quarantine and self.quarantine:
-                    try:
-                        self.quarantine.quarantine_file(
-                            file_path, 
-                            result.malware_name, 
-                            file_hash, 
-                            result.severity
-                        )
-                    except Exception as e:
-                        print(f"⚠️  Auto-quarantine failed: {e}")
-                
-                return result
+        if yara_match:
+            result.detected = True
+            result.malware_name = yara_match
+            result.severity = "medium"
+            result.reason = "yara_match"
+            
+            if log_result:
+                self.logger.log(result.to_dict())
+            
+            # Auto-quarantine the file
+            if self.auto_quarantine and self.quarantine:
+                try:
+                    self.quarantine.quarantine_file(
+                        file_path, 
+                        result.malware_name, 
+                        result.hash, 
+                        result.severity
+                    )
+                except Exception as e:
+                    print(f"⚠️  Auto-quarantine failed: {e}")
+            
+            return result
         
         # File is clean
         result.reason = "clean"
@@ -358,74 +571,204 @@ class Scanner:
             self.logger.log(result.to_dict())  # Log clean files too
         return result
     
+    @staticmethod
+    def _map_file(file_path: Path, size: int) -> Optional[mmap.mmap]:
+        """
+        Read-only memory map of a file, or None to read it by path.
+        
+        Only files in the size range the hasher itself maps are mapped
+        (see FileHasher.MMAP_MIN_SIZE); others are left to its reads and
+        YARA's own file access.
+        """
+        if not FileHasher.MMAP_MIN_SIZE <= size <= FileHasher.MMAP_MAX_SIZE:
+            return None
+        try:
+            with open(file_path, 'rb', buffering=0) as f:
+                # The mapping stays valid after the file is closed
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+    
     def scan_directory(self, dir_path: Path,
                        skip_non_suspicious: bool = True,
                        recursive: bool = True,
                        scan_archives: bool = True,
-                       progress_callback: Optional[Callable[[int, int, Path], None]] = None
+                       progress_callback: Optional[Callable[[int, int, Path], None]] = None,
+                       max_workers: Optional[int] = None
                        ) -> List[ScanResult]:
         """
         Scan all files in a directory.
         
+        Holds every result in memory; large scans should use
+        scan_directory_iter with a ScanSummaryAccumulator instead.
+        
         Args:
             dir_path: Path to directory
             skip_non_suspicious: Skip non-executable files
             recursive: Scan subdirectories
             scan_archives: Extract and scan archive contents
             progress_callback: Optional callback(current, total, file_path)
+            max_workers: Number of scanning threads (default: CPU count)
             
         Returns:
-            List of ScanResult objects
+            List of ScanResult objects, in walk order
+        """
+        return list(self.scan_directory_iter(
+            dir_path, skip_non_suspicious, recursive, scan_archives,
+            progress_callback, max_workers
+        ))
+    
+    def scan_directory_iter(self, dir_path: Path,
+                            skip_non_suspicious: bool = True,
+                            recursive: bool = True,
+                            scan_archives: bool = True,
+                            progress_callback: Optional[Callable[[int, int, Path], None]] = None,
+                            max_workers: Optional[int] = None
+                            ) -> Iterator[ScanResult]:
+        """
+        Scan all files in a directory, yielding results as they're ready.
+        
+        Only the files being scanned are held in memory, not the results
+        of the whole scan; every result is also in the scan log. Files are
+        scanned concurrently, but results are yielded and logged in walk
+        order (by name within each directory), so they don't vary from run
+        to run.
+        
+        Args:
+            dir_path: Path to directory
+            skip_non_suspicious: Skip non-executable files
+            recursive: Scan subdirectories
+            scan_archives: Extract and scan archive contents
+            progress_callback: Optional callback(current, total, file_path)
+            max_workers: Number of scanning threads (default: CPU count)
+            
+        Yields:
+            ScanResult objects, in walk order
         """
         dir_path = Path(dir_path).resolve()
         
         if not dir_path.is_dir():
             print(f"❌ Directory not found: {dir_path}")
-            return []
+            return
         
-        results: List[ScanResult] = []
-        
-        # Collect all files first
-        if recursive:
-            files = list(dir_path.rglob('*'))
-        else:
-            files = list(dir_path.glob('*'))
-        
-        files = [f for f in files if f.is_file()]
+        # Collect all files first (for the progress total), keeping each
+        # file's stat from the walk
+        files = list(self._walk_files(dir_path, recursive))
         total = len(files)
         
-        for i, file_path in enumerate(files):
-            try:
-                if progress_callback:
-                    progress_callback(i + 1, total, file_path)
+        workers = max_workers or os.cpu_count() or 1
+        # Files submitted but not yet consumed; bounded so a slow file at
+        # the head of the queue doesn't leave finished results piling up
+        max_pending = workers * 4
+        
+        try:
+            # Hashing releases the GIL, so worker threads overlap disk reads
+            # with hashing
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                remaining = iter(files)
+                # (future, path) in submission order
+                pending: Deque[Tuple[Future, Path]] = deque()
+                done = 0
                 
-                # Check if archive
-                if scan_archives and self.is_archive(str(file_path)):
-                    archive_results = self.scan_archive(file_path, skip_non_suspicious)
-                    results.extend(archive_results)
+                while True:
+                    for file_path, stat_result in itertools.islice(
+                            remaining, max_pending - len(pending)):
+                        future = pool.submit(self._scan_directory_entry, file_path,
+                                             stat_result, skip_non_suspicious,
+                                             scan_archives)
+                        pending.append((future, file_path))
                     
-                    # Print detections from archives
-                    for r in archive_results:
-                        if r.detected:
-                            print(f"🚨 DETECTED (in archive): {r.file_name} - {r.malware_name}")
-                else:
-                    result = self.scan_file(file_path, 
-                                            skip_non_suspicious=skip_non_suspicious,
-                                            log_result=True,
-                                            scan_archives=False)
-                    if result:
-                        results.append(result)
-                        
+                    if not pending:
+                        break
+                    
+                    # Results are taken in submission order, waiting on the
+                    # oldest file while later ones keep scanning
+                    future, file_path = pending.popleft()
+                    done += 1
+                    
+                    try:
+                        entry_results, in_archive = future.result()
+                    except PermissionError:
+                        print(f"⚠️  Permission denied: {file_path}")
+                        continue
+                    except Exception as e:
+                        print(f"⚠️  Error scanning {file_path}: {e}")
+                        continue
+                    finally:
+                        if progress_callback:
+                            progress_callback(done, total, file_path)
+                    
+                    for r in entry_results:
+                        # Logged here rather than in the workers, so the
+                        # history is in the same order as the results
+                        self.logger.log(r.to_dict())
                         # Print detections immediately
-                        if result.detected:
-                            print(f"🚨 DETECTED: {result.file_name} - {result.malware_name}")
-                        
-            except PermissionError:
-                print(f"⚠️  Permission denied: {file_path}")
-            except Exception as e:
-                print(f"⚠️  Error scanning {file_path}: {e}")
+                        if r.detected:
+                            if in_archive:
+                                print(f"🚨 DETECTED (in archive): {r.file_name} - {r.malware_name}")
+                            else:
+                                print(f"🚨 DETECTED: {r.file_name} - {r.malware_name}")
+                        yield r
+        finally:
+            # One write for all hashes computed during the scan, and the last
+            # buffered log records, so the history is complete once the
+            # scan ends (or is abandoned)
+            self.hash_cache.flush()
+            self.logger.flush()
+    
+    @staticmethod
+    def _walk_files(dir_path: Path, recursive: bool) -> Iterator[Tuple[Path, os.stat_result]]:
+        """
+        Yield (path, stat) for the files under a directory.
         
-        return results
+        os.scandir reports entry types without a stat call, so each file is
+        stat'd once here and the result reused for the rest of its scan.
+        Entries are taken in name order, so the walk doesn't depend on the
+        filesystem's listing order. Symlinked directories aren't followed;
+        unreadable directories are skipped.
+        """
+        pending = [str(dir_path)]
+        while pending:
+            subdirs = []
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in sorted(entries, key=_entry_name):
+                        try:
+                            if entry.is_file():
+                                yield Path(entry.path), entry.stat()
+                            elif recursive and entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            # Depth-first, subdirectories in name order
+            pending.extend(reversed(subdirs))
+    
+    def _scan_directory_entry(self, file_path: Path,
+                              stat_result: os.stat_result,
+                              skip_non_suspicious: bool,
+                              scan_archives: bool):
+        """
+        Scan one file found by scan_directory (runs in a worker thread).
+        
+        The results aren't logged; scan_directory_iter logs them in order.
+        
+        Returns:
+            Tuple of (results, whether they came from an archive)
+        """
+        if scan_archives and self.is_archive(str(file_path)):
+            return self.scan_archive(file_path, skip_non_suspicious,
+                                     hash_known_sizes_only=True,
+                                     log_result=False), True
+        
+        result = self._scan_file(file_path,
+                                 skip_non_suspicious=skip_non_suspicious,
+                                 log_result=False,
+                                 scan_archives=False,
+                                 hash_known_sizes_only=True,
+                                 stat_result=stat_result)
+        return ([result] if result else []), False
     
     def get_scan_summary(self, results: List[ScanResult]) -> Dict[str, Any]:
         """
@@ -437,20 +780,59 @@ class Scanner:
         Returns:
             Summary dictionary
         """
-        total = len(results)
-        detected = sum(1 for r in results if r.detected)
-        skipped = sum(1 for r in results if r.reason == "skipped")
-        clean = total - detected - skipped
-        
-        total_size = sum(r.file_size for r in results)
-        from_archives = sum(1 for r in results if r.from_archive)
+        summary = ScanSummaryAccumulator()
+        for r in results:
+            summary.add(r)
+        return summary.finalize()
+
+
+class ScanSummaryAccumulator:
+    """
+    Running summary statistics for a scan.
+    
+    Results are counted as they are added, so a summary of a streamed
+    directory scan takes constant memory however many files it covers.
+    """
+    
+    __slots__ = ('total', 'detected', 'skipped', 'errors', 'from_archives', 'total_size')
+    
+    def __init__(self):
+        self.total = 0
+        self.detected = 0
+        self.skipped = 0
+        # Files that couldn't be fully scanned (hash errors, YARA timeouts, ...)
+        self.errors = 0
+        self.from_archives = 0
+        self.total_size = 0
+    
+    def add(self, result: ScanResult) -> None:
+        """Count one scan result."""
+        self.total += 1
+        if result.detected:
+            self.detected += 1
+        elif result.reason == "skipped":
+            self.skipped += 1
+        elif result.reason != "clean":
+            self.errors += 1
+        self.total_size += result.file_size
+        if result.from_archive:
+            self.from_archives += 1
+    
+    def finalize(self) -> Dict[str, Any]:
+        """
+        Summary of the results added so far.
         
+        Returns:
+            Summary dictionary, as Scanner.get_scan_summary gives it
+        """
+        total, detected, skipped, errors = self.total, self.detected, self.skipped, self.errors
         return {
             'total_files': total,
             'detected': detected,
-            'clean': clean,
+            'clean': total - detected - skipped - errors,
             'skipped': skipped,
-            'from_archives': from_archives,
-            'total_size': format_file_size(total_size),
+            'errors': errors,
+            'from_archives': self.from_archives,
+            'total_size': format_file_size(self.total_size),
             'detection_rate': f"{(detected / max(total - skipped, 1)) * 100:.1f}%"
         }
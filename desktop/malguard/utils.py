@@ -3,16 +3,27 @@ Utility Functions
 Cross-platform paths, formatting, and helper functions.
 """
 
+import functools
+import json
 import os
 import sys
 from pathlib import Path
-from typing import Set
+from typing import Any, FrozenSet
 
+# orjson is optional - faster JSON, falls back to the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+
+@functools.lru_cache(maxsize=1)
 def get_config_dir() -> Path:
     """
     Get the configuration directory based on OS.
     
+    Resolved and created once per process; later calls return the cached path.
+    
     Returns:
         Path to config directory (created if doesn't exist)
     """
@@ -31,29 +42,69 @@ def get_config_dir() -> Path:
     return config_dir
 
 
-def get_suspicious_extensions() -> Set[str]:
+# File extensions considered potentially dangerous (lowercase, leading dot).
+# Built once; is_suspicious_file checks every scanned file against it.
+SUSPICIOUS_EXTENSIONS: FrozenSet[str] = frozenset({
+    # Windows executables
+    '.exe', '.dll', '.sys', '.scr', '.pif', '.com',
+    # Scripts
+    '.bat', '.cmd', '.ps1', '.vbs', '.vbe', '.js', '.jse', '.wsf', '.wsh',
+    # Java/Python/Other
+    '.jar', '.py', '.pyw', '.sh', '.bash',
+    # Installers
+    '.msi', '.msp', '.msu',
+    # Linux/macOS
+    '.elf', '.bin', '.run', '.deb', '.rpm', '.dmg', '.app', '.pkg',
+    # Mobile
+    '.apk', '.ipa',
+    # Office macros
+    '.docm', '.xlsm', '.pptm',
+})
+
+
+def get_suspicious_extensions() -> FrozenSet[str]:
     """
     Get set of file extensions considered potentially dangerous.
     
     Returns:
-        Set of lowercase extensions with leading dot
+        Frozen set of lowercase extensions with leading dot
+    """
+    return SUSPICIOUS_EXTENSIONS
+
+
+def dumps_json(data: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes, using orjson when installed.
+    
+    Args:
+        data: Object to serialize (unknown types are converted with str)
+        indent: Pretty-print with 2-space indentation instead of compact output
+        sort_keys: Sort object keys
+        
+    Returns:
+        JSON bytes
+    """
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(data, default=str, option=option)
+    
+    if indent:
+        text = json.dumps(data, indent=2, sort_keys=sort_keys, default=str)
+    else:
+        text = json.dumps(data, sort_keys=sort_keys, separators=(',', ':'), default=str)
+    return text.encode('utf-8')
+
+
+def loads_json(data: bytes) -> Any:
+    """
+    Parse JSON bytes, using orjson when installed.
+    
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON
     """
-    return {
-        # Windows executables
-        '.exe', '.dll', '.sys', '.scr', '.pif', '.com',
-        # Scripts
-        '.bat', '.cmd', '.ps1', '.vbs', '.vbe', '.js', '.jse', '.wsf', '.wsh',
-        # Java/Python/Other
-        '.jar', '.py', '.pyw', '.sh', '.bash',
-        # Installers
-        '.msi', '.msp', '.msu',
-        # Linux/macOS
-        '.elf', '.bin', '.run', '.deb', '.rpm', '.dmg', '.app', '.pkg',
-        # Mobile
-        '.apk', '.ipa',
-        # Office macros
-        '.docm', '.xlsm', '.pptm',
-    }
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 def format_file_size(size_bytes: int) -> str:
@@ -92,5 +143,4 @@ def is_suspicious_file(file_path: Path) -> bool:
     Returns:
         True if extension is in suspicious list
     """
-    ext = file_path.suffix.lower()
-    return ext in get_suspicious_extensions()
+    return file_path.suffix.lower() in SUSPICIOUS_EXTENSIONS
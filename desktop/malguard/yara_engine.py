@@ -3,6 +3,9 @@ YARA Engine Module
 Optional YARA rule-based malware detection.
 """
 
+import functools
+import hashlib
+import os
 from pathlib import Path
 from typing import Optional, List
 
@@ -16,6 +19,10 @@ except ImportError:
     YARA_AVAILABLE = False
 
 
+class YaraTimeoutError(Exception):
+    """A YARA match took longer than YaraEngine.MATCH_TIMEOUT."""
+
+
 class YaraEngine:
     """
     YARA rule-based malware detection engine.
@@ -23,15 +30,26 @@ class YaraEngine:
     YARA rules allow pattern-based detection beyond simple hash matching.
     """
     
-    def __init__(self, rules_dir: Optional[Path] = None):
+    # Seconds a single match may take before it is abandoned (raising
+    # YaraTimeoutError), so one pathological file can't stall a scan
+    MATCH_TIMEOUT = 60
+    
+    def __init__(self, rules_dir: Optional[Path] = None, fast_mode: bool = False):
         """
         Initialize YARA engine.
         
         Args:
             rules_dir: Directory containing .yar files (default: config dir/yara_rules)
+            fast_mode: Match in YARA's fast mode, which stops searching for
+                a string at its first occurrence. Faster, but rules that
+                count or index string occurrences (#s > 3, @s[2]) can
+                then miss.
         """
         self.available = YARA_AVAILABLE
+        self.fast_mode = fast_mode
         self.rules = None
+        # rules.match with the match options, bound once rules are loaded
+        self._match = None
         
         if rules_dir:
             self.rules_dir = Path(rules_dir)
@@ -43,6 +61,9 @@ class YaraEngine:
     
     def _compile_rules(self) -> None:
         """Compile all YARA rules from the rules directory."""
+        self.rules = None
+        self._match = None
+        
         if not self.rules_dir.exists():
             self.rules_dir.mkdir(parents=True, exist_ok=True)
             return
@@ -53,14 +74,52 @@ class YaraEngine:
         if not rule_files:
             return
         
+        # Compiled rules are cached next to the sources, named by a
+        # fingerprint of the rule files so any edit, addition or removal
+        # misses the cache and recompiles
+        cache_file = self.rules_dir / f".compiled-{self._fingerprint(rule_files)}.yarc"
+        
         try:
-            # Compile rules from files
-            filepaths = {f"rule_{i}": str(f) for i, f in enumerate(rule_files)}
-            self.rules = yara.compile(filepaths=filepaths)
+            if cache_file.exists():
+                try:
+                    self.rules = yara.load(str(cache_file))
+                except yara.Error:
+                    self.rules = None
+            
+            if self.rules is None:
+                # Compile rules from files
+                filepaths = {f"rule_{i}": str(f) for i, f in enumerate(rule_files)}
+                self.rules = yara.compile(filepaths=filepaths)
+                self._save_compiled(cache_file)
+            
+            self._match = functools.partial(self.rules.match, fast=self.fast_mode,
+                                            timeout=self.MATCH_TIMEOUT)
             print(f"✅ Compiled {len(rule_files)} YARA rule file(s)")
         except Exception as e:
             print(f"⚠️  Warning: Failed to compile YARA rules: {e}")
             self.rules = None
+            self._match = None
+    
+    @staticmethod
+    def _fingerprint(rule_files: List[Path]) -> str:
+        """Short digest of the rule files' names, sizes and mtimes."""
+        h = hashlib.blake2b(digest_size=8)
+        for f in sorted(rule_files):
+            st = f.stat()
+            h.update(f"{f.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        return h.hexdigest()
+    
+    def _save_compiled(self, cache_file: Path) -> None:
+        """Save compiled rules to cache_file, replacing older caches."""
+        try:
+            for old in self.rules_dir.glob(".compiled-*.yarc"):
+                old.unlink()
+            tmp = cache_file.with_suffix(".tmp")
+            self.rules.save(str(tmp))
+            os.replace(tmp, cache_file)
+        except (OSError, yara.Error):
+            # Only a cache; the rules compiled fine
+            pass
     
     def scan_file(self, file_path: Path) -> Optional[str]:
         """
@@ -71,15 +130,20 @@ class YaraEngine:
             
         Returns:
             Name of matched rule, or None if no match
+            
+        Raises:
+            YaraTimeoutError: If matching took longer than MATCH_TIMEOUT
         """
         if not self.available or self.rules is None:
             return None
         
         try:
-            matches = self.rules.match(filepath=str(file_path))
+            matches = self._match(filepath=str(file_path))
             if matches:
                 # Return first matched rule name
                 return matches[0].rule
+        except yara.TimeoutError as e:
+            raise YaraTimeoutError(str(file_path)) from e
         except Exception as e:
             print(f"⚠️  YARA error scanning {file_path}: {e}")
         
@@ -94,14 +158,19 @@ class YaraEngine:
             
         Returns:
             Name of matched rule, or None if no match
+            
+        Raises:
+            YaraTimeoutError: If matching took longer than MATCH_TIMEOUT
         """
         if not self.available or self.rules is None:
             return None
         
         try:
-            matches = self.rules.match(data=data)
+            matches = self._match(data=data)
             if matches:
                 return matches[0].rule
+        except yara.TimeoutError as e:
+            raise YaraTimeoutError("data") from e
         except Exception as e:
             print(f"⚠️  YARA error scanning data: {e}")
         
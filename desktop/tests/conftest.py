@@ -0,0 +1,6 @@
+"""Shared test setup: make the malguard package importable from desktop/."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
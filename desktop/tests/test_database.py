@@ -0,0 +1,132 @@
+"""Tamper checks for the signature database's append log."""
+
+import pytest
+
+from malguard.database import SignatureDatabase
+
+HASHES = [f"{i:064x}" for i in range(1, 5)]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A database with a compacted main file and three logged changes."""
+    path = tmp_path / "signatures.json"
+    db = SignatureDatabase(path)
+    db.add(HASHES[0], "Base")
+    db.compact()
+    db.add(HASHES[1], "One")
+    db.add(HASHES[2], "Two")
+    db.remove(HASHES[1])
+    return path
+
+
+def log_lines(path):
+    return path.with_suffix(".log").read_bytes().splitlines(keepends=True)
+
+
+def write_log(path, lines):
+    path.with_suffix(".log").write_bytes(b"".join(lines))
+
+
+def test_log_replays(db_path):
+    db = SignatureDatabase(db_path)
+    assert db._intact
+    assert set(db.list_all()) == {HASHES[0], HASHES[2]}
+
+
+def test_compacted_database_reopens(db_path):
+    SignatureDatabase(db_path).compact()
+    db = SignatureDatabase(db_path)
+    assert db._intact
+    assert set(db.list_all()) == {HASHES[0], HASHES[2]}
+
+
+def test_truncated_log_is_rejected(db_path):
+    write_log(db_path, log_lines(db_path)[:2])
+    db = SignatureDatabase(db_path)
+    assert not db._intact
+    assert db.count() == 0
+
+
+def test_deleted_log_is_rejected(db_path):
+    db_path.with_suffix(".log").unlink()
+    assert not SignatureDatabase(db_path)._intact
+
+
+def test_deleted_record_is_rejected(db_path):
+    lines = log_lines(db_path)
+    write_log(db_path, [lines[0], lines[2]])
+    assert not SignatureDatabase(db_path)._intact
+
+
+def test_replayed_record_is_rejected(db_path):
+    lines = log_lines(db_path)
+    # Re-append the signed "add One" record after its removal
+    write_log(db_path, lines + [lines[0]])
+    assert not SignatureDatabase(db_path)._intact
+
+
+def test_deleted_head_is_rejected(db_path):
+    db_path.with_suffix(".head").unlink()
+    assert not SignatureDatabase(db_path)._intact
+
+
+def test_interrupted_head_update_keeps_records(db_path):
+    # A record written without its head update (e.g. a crash between the
+    # two) is still chained, so it's kept
+    head = db_path.with_suffix(".head").read_bytes()
+    db = SignatureDatabase(db_path)
+    db.add(HASHES[3], "Three")
+    db_path.with_suffix(".head").write_bytes(head)
+    
+    db = SignatureDatabase(db_path)
+    assert db._intact
+    assert db.lookup(HASHES[3])["name"] == "Three"
+
+
+def test_interrupted_compaction_keeps_records(db_path, monkeypatch):
+    # A crash after the compacted main file is in place, before its head
+    # is, is finished on the next load
+    from malguard import database
+    real_replace = database.os.replace
+
+    def replace(src, dst):
+        if str(dst) == str(db_path.with_suffix(".head")):
+            raise OSError("simulated crash")
+        real_replace(src, dst)
+
+    db = SignatureDatabase(db_path)
+    monkeypatch.setattr(database.os, "replace", replace)
+    assert not db.compact()
+    monkeypatch.undo()
+
+    db = SignatureDatabase(db_path)
+    assert db._intact
+    assert sorted(db.signatures) == [HASHES[0], HASHES[2]]
+    assert not db_path.with_suffix(".log").exists()
+    db.add(HASHES[3], "Three")
+    assert SignatureDatabase(db_path).count() == 3
+
+
+def test_tampered_database_refuses_changes(db_path):
+    write_log(db_path, log_lines(db_path)[:-1])
+    files = {p: p.read_bytes() for p in db_path.parent.iterdir()}
+
+    db = SignatureDatabase(db_path)
+    assert not db.add(HASHES[3], "Three")
+    with db.batch():
+        db.add(HASHES[3], "Three")
+    assert not db.compact()
+    assert {p: p.read_bytes() for p in db_path.parent.iterdir()} == files
+
+
+def test_batch_writes_verifiable_log(tmp_path):
+    path = tmp_path / "signatures.json"
+    db = SignatureDatabase(path)
+    with db.batch():
+        for file_hash in HASHES:
+            db.add(file_hash, "Batch")
+    
+    db = SignatureDatabase(path)
+    assert db._intact
+    assert db.count() == len(HASHES)
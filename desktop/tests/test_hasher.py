@@ -0,0 +1,37 @@
+"""HashCache reuse rules."""
+
+import hashlib
+import os
+import time
+
+from malguard.hasher import HashCache
+
+
+def test_rewritten_file_with_restored_mtime_is_rehashed(tmp_path):
+    cache = HashCache(tmp_path / "hash_cache.db")
+    sample = tmp_path / "sample.exe"
+    sample.write_bytes(b"clean content")
+    st = sample.stat()
+    assert cache.calculate_sha256(sample) == hashlib.sha256(b"clean content").hexdigest()
+    cache.flush()
+    
+    # Same size, old mtime put back (as touch -r would). File timestamps
+    # come from a coarse clock, so wait for the ctime to move on.
+    time.sleep(0.05)
+    sample.write_bytes(b"evil! content")
+    os.utime(sample, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert sample.stat().st_mtime_ns == st.st_mtime_ns
+    
+    cache = HashCache(tmp_path / "hash_cache.db")
+    assert cache.calculate_sha256(sample) == hashlib.sha256(b"evil! content").hexdigest()
+
+
+def test_unchanged_file_is_served_from_cache(tmp_path):
+    cache = HashCache(tmp_path / "hash_cache.db")
+    sample = tmp_path / "sample.exe"
+    sample.write_bytes(b"content")
+    digest = cache.calculate_sha256(sample)
+    cache.flush()
+    
+    cache = HashCache(tmp_path / "hash_cache.db")
+    assert cache.lookup(sample, sample.stat()) == digest
@@ -0,0 +1,135 @@
+"""Scanner behaviour with stand-in YARA engines."""
+
+import hashlib
+import zipfile
+
+import pytest
+
+from malguard.database import SignatureDatabase
+from malguard.hasher import FileHasher, HashCache
+from malguard.logger import ScanLogger
+from malguard.scanner import Scanner
+from malguard.yara_engine import YaraTimeoutError
+
+
+class NoYara:
+    """YARA engine with no rules loaded."""
+    
+    def is_available(self):
+        return False
+
+
+class TimingOutYara:
+    """YARA engine whose every match times out."""
+    
+    def is_available(self):
+        return True
+    
+    def scan_data(self, data):
+        raise YaraTimeoutError("data")
+    
+    scan_bytes = scan_data
+    
+    def scan_file(self, file_path):
+        raise YaraTimeoutError(str(file_path))
+
+
+@pytest.fixture
+def make_scanner(tmp_path):
+    def make(yara_engine=None):
+        return Scanner(database=SignatureDatabase(tmp_path / "signatures.json"),
+                       logger=ScanLogger(tmp_path / "history.jsonl"),
+                       yara_engine=yara_engine or NoYara(),
+                       hash_cache=HashCache(tmp_path / "hash_cache.db"),
+                       auto_quarantine=False)
+    return make
+
+
+def test_yara_timeout_is_not_clean(tmp_path, make_scanner):
+    sample = tmp_path / "sample.exe"
+    sample.write_bytes(b"MZ" + bytes(100))
+    scanner = make_scanner(TimingOutYara())
+    
+    result = scanner.scan_file(sample)
+    assert not result.detected
+    assert result.reason == "yara_timeout"
+    
+    summary = scanner.get_scan_summary([result])
+    assert summary['errors'] == 1
+    assert summary['clean'] == 0
+    
+    result = scanner.scan_bytes(b"MZ", "member.exe")
+    assert result.reason == "yara_timeout"
+
+
+def test_directory_scan_order_is_deterministic(tmp_path, make_scanner):
+    root = tmp_path / "tree"
+    for name in ["b", "a", "c/e", "c/d", "f/z"]:
+        (root / name).mkdir(parents=True, exist_ok=True)
+    names = []
+    for i, directory in enumerate(["", "b", "a", "c/e", "c/d", "f/z", "c"] * 3):
+        name = f"{directory}/file{20 - i}.exe".lstrip("/")
+        (root / name).write_bytes(bytes(i * 1000))
+        names.append(name)
+    with zipfile.ZipFile(root / "a" / "archive.zip", "w") as zf:
+        zf.writestr("inner2.exe", b"two")
+        zf.writestr("inner1.exe", b"one")
+    
+    scanner = make_scanner()
+    orders = [[r.file_path for r in scanner.scan_directory(root, max_workers=8)]
+              for _ in range(5)]
+    assert all(order == orders[0] for order in orders)
+    
+    # Each directory's files come together, in name order
+    by_directory = {}
+    for path in orders[0]:
+        if "archive.zip/" not in path:
+            directory, _, name = path.rpartition("/")
+            by_directory.setdefault(directory, []).append(name)
+    assert sum(map(len, by_directory.values())) == len(names)
+    for directory, dir_names in by_directory.items():
+        assert dir_names == sorted(dir_names)
+        start = [p.rpartition("/")[0] for p in orders[0]].index(directory)
+        assert all(p.rpartition("/")[0] == directory
+                   for p in orders[0][start:start + len(dir_names)])
+    archive_members = [p.rsplit("/", 1)[1] for p in orders[0] if "archive.zip/" in p]
+    assert archive_members == ["inner2.exe", "inner1.exe"]
+    
+    # The history is written in result order
+    history = [r["file_path"] for r in reversed(scanner.logger.get_history(limit=1000))]
+    assert history[-len(orders[0]):] == orders[0]
+
+
+class RecordingYara:
+    """YARA engine that matches nothing and records how it was given files."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def is_available(self):
+        return True
+    
+    def scan_data(self, data):
+        self.calls.append("data")
+        return None
+    
+    def scan_file(self, file_path):
+        self.calls.append("file")
+        return None
+
+
+def test_file_is_mapped_only_when_hashed_in_mapping_range(tmp_path, make_scanner):
+    yara = RecordingYara()
+    scanner = make_scanner(yara)
+    small = tmp_path / "small.exe"
+    small.write_bytes(bytes(1000))
+    mid = tmp_path / "mid.exe"
+    mid.write_bytes(bytes(FileHasher.MMAP_MIN_SIZE))
+    
+    # Hashed from the same mapping YARA matches
+    assert scanner.scan_file(mid).hash == hashlib.sha256(mid.read_bytes()).hexdigest()
+    # Cached hash: nothing to share, YARA reads the file itself
+    scanner.scan_file(mid)
+    # Below the hasher's mapping range
+    scanner.scan_file(small)
+    assert yara.calls == ["data", "file", "file"]